@@ -1,4 +1,5 @@
 import os
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Union
@@ -71,6 +72,23 @@ PREDEFINED_DOMAINS = [
     # … 如有需要可以继续扩展
 ]
 
+# 最近一次格式化的时间戳：(整秒, 字符串)，同一秒内的生命周期记录直接复用
+_last_update_time = (None, "")
+
+
+def _format_update_time() -> str:
+    """
+    返回 "%Y-%m-%d %H:%M:%S" 格式的当前时间，同一秒内只格式化一次
+    """
+    global _last_update_time
+    second = int(time.time())
+    cached_second, cached_text = _last_update_time
+    if cached_second != second:
+        cached_text = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+        _last_update_time = (second, cached_text)
+    return cached_text
+
+
 class BaseLife:
     tk_client = DashScopeClient()
     def __init__(self, *, domain: str = "Technology", **kwargs):
@@ -111,7 +129,7 @@ class BaseLife:
             lt.value if isinstance(lt, LifeType) else lt for lt in raw
         ]
 
-        update_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        update_time = _format_update_time()
         try:
             storage = os.path.getsize(source_file)
         except Exception:
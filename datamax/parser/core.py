@@ -1,29 +1,69 @@
+import functools
+import hashlib
 import importlib
+import importlib.util
 import json
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Union, Optional, Any
+from typing import TYPE_CHECKING, Dict, List, Union, Optional, Any
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from loguru import logger
-from openai import OpenAI
 from datamax.utils.lifecycle_types import LifeType
 from datamax.utils import data_cleaner
 from datamax.parser.base import BaseLife
-import datamax.utils.qa_generator as qa_gen
+
+# openai/httpx, langchain and the QA generator are only needed for splitting and
+# labeling; they are imported where used so that parsing alone starts fast
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class ModelInvoker:
-    def __init__(self):
+    def __init__(self, max_connections: int = 64, timeout: float = 120):
+        self.client = None
+        self.max_connections = max_connections
+        self.timeout = timeout
+        # one client (and keep-alive connection pool) per endpoint, reused across calls
+        self._clients: Dict[tuple, "OpenAI"] = {}
+
+    def _get_client(self, api_key, base_url) -> "OpenAI":
+        key = (api_key, base_url)
+        client = self._clients.get(key)
+        if client is None:
+            import httpx
+            from openai import OpenAI
+
+            http_client = httpx.Client(
+                # HTTP/2 multiplexing needs the optional h2 package
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=self.timeout,
+            )
+            client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            self._clients[key] = client
+        return client
+
+    def close(self):
+        for client in self._clients.values():
+            client.close()
+        self._clients.clear()
         self.client = None
 
     def invoke_model(self, api_key, base_url, model_name, messages):
+        import datamax.utils.qa_generator as qa_gen
+
         base_url = qa_gen.complete_api_url(base_url)
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=base_url,
-        )
+        self.client = self._get_client(api_key, base_url)
 
         completion = self.client.chat.completions.create(
             model=model_name,
@@ -33,6 +73,28 @@ class ModelInvoker:
         return json_data.get("choices")[0].get("message").get("content", "")
 
 
+# file extension -> parser class name, built once instead of on every create_parser call
+PARSER_CLASS_NAMES = {
+    ".md": "MarkdownParser",
+    ".docx": "DocxParser",
+    ".doc": "DocParser",
+    ".wps": "WpsParser",
+    ".epub": "EpubParser",
+    ".html": "HtmlParser",
+    ".txt": "TxtParser",
+    ".pptx": "PptxParser",
+    ".ppt": "PptParser",
+    ".pdf": "PdfParser",
+    ".jpg": "ImageParser",
+    ".jpeg": "ImageParser",
+    ".png": "ImageParser",
+    ".webp": "ImageParser",
+    ".xlsx": "XlsxParser",
+    ".xls": "XlsParser",
+}
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".webp"})
+
+
 class ParserFactory:
     @staticmethod
     def create_parser(
@@ -45,34 +107,17 @@ class ParserFactory:
         Create a parser instance based on the file extension.
         :param file_path: The path to the file to be parsed.
         :param to_markdown: Flag to indicate whether the output should be in Markdown format.
-                    (only supported files in .doc or .docx format)
+                    (only supported files in .doc, .docx or .pdf format; .pdf needs pymupdf4llm)
         :param use_mineru: Flag to indicate whether MinerU should be used. (only supported files in .pdf format)
         :return: An instance of the parser class corresponding to the file extension.
         """
         file_extension = os.path.splitext(file_path)[1].lower()
-        parser_class_name = {
-            ".md": "MarkdownParser",
-            ".docx": "DocxParser",
-            ".doc": "DocParser",
-            ".wps": "WpsParser",
-            ".epub": "EpubParser",
-            ".html": "HtmlParser",
-            ".txt": "TxtParser",
-            ".pptx": "PptxParser",
-            ".ppt": "PptParser",
-            ".pdf": "PdfParser",
-            ".jpg": "ImageParser",
-            ".jpeg": "ImageParser",
-            ".png": "ImageParser",
-            ".webp": "ImageParser",
-            ".xlsx": "XlsxParser",
-            ".xls": "XlsParser",
-        }.get(file_extension)
+        parser_class_name = PARSER_CLASS_NAMES.get(file_extension)
 
         if not parser_class_name:
             return None
 
-        if file_extension in [".jpg", "jpeg", ".png", ".webp"]:
+        if file_extension in IMAGE_EXTENSIONS:
             module_name = f"datamax.parser.image_parser"
         else:
             # Dynamically determine the module name based on the file extension
@@ -91,6 +136,7 @@ class ParserFactory:
                     file_path=file_path,
                     use_mineru=use_mineru,
                     domain=domain,
+                    to_markdown=to_markdown,
                 )
             elif parser_class_name == "DocxParser" or parser_class_name == "DocParser" or parser_class_name == "WpsParser":
                 return parser_class(
@@ -105,6 +151,34 @@ class ParserFactory:
             raise e
 
 
+def _file_sha256(file_path: str) -> str:
+    """
+    Hex sha256 of a file, streamed in 1 MiB blocks so large PDFs are not loaded into memory.
+    """
+    with open(file_path, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+        return h.hexdigest()
+
+
+def _parse_one_file(file_path: str, use_mineru: bool, to_markdown: bool, domain: str):
+    """
+    Parse one file with a fresh parser built from the given options.
+    Module level so it pickles for worker processes; DataMax._parse_file delegates here too.
+    """
+    parser = ParserFactory.create_parser(
+        use_mineru=use_mineru,
+        file_path=file_path,
+        to_markdown=to_markdown,
+        domain=domain,
+    )
+    if parser:
+        return parser.parse(file_path=file_path)
+
+
 class DataMax(BaseLife):
     def __init__(
         self,
@@ -113,6 +187,8 @@ class DataMax(BaseLife):
         to_markdown: bool = False,
         ttl: int = 3600,
         domain: str = "Technology",
+        max_workers: int = 1,
+        use_processes: bool = False,
     ):
         """
         Initialize the DataMaxParser with file path and parsing options.
@@ -121,6 +197,9 @@ class DataMax(BaseLife):
         :param use_mineru: Flag to indicate whether MinerU should be used.
         :param to_markdown: Flag to indicate whether the output should be in Markdown format.
         :param ttl: Time to live for the cache.
+        :param max_workers: Number of files parsed concurrently for list or directory input.
+        :param use_processes: Parse concurrent files in worker processes instead of threads,
+                    for CPU-bound batches such as large PDFs.
         """
         super().__init__(domain=domain)
         self.file_path = file_path
@@ -130,22 +209,137 @@ class DataMax(BaseLife):
         self.model_invoker = ModelInvoker()
         self._cache = {}
         self.ttl = ttl
+        self.max_workers = max_workers
+        self.use_processes = use_processes
 
-    def set_data(self, file_name, parsed_data):
+    def close(self):
+        """
+        Close the HTTP clients (and their connection pools) held by the model invoker.
+        """
+        self.model_invoker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def set_data(self, file_name, parsed_data, now: Optional[float] = None):
         """
         Set cached data
-        :param file_name: File name as cache key
+        :param file_name: Cache key, see _cache_key
         :param parsed_data: Parsed data as value
+        :param now: Monotonic timestamp of the current batch (defaults to now)
         """
         logger.info(f"cache ttl is {self.ttl}s")
         if self.ttl > 0:
-            self._cache[file_name] = {
-                "data": parsed_data,
-                "ttl": time.time() + self.ttl,
-            }
+            if now is None:
+                now = time.monotonic()
+            self._cache[file_name] = (parsed_data, now + self.ttl)
             logger.info(
-                f"✅ [Cache Updated] Cached data for {file_name}, ttl: {self._cache[file_name]['ttl']}"
+                f"✅ [Cache Updated] Cached data for {file_name}, ttl: {self._cache[file_name][1]}"
+            )
+
+    def _purge_expired(self, now: float):
+        """
+        Drop expired cache entries
+        :param now: Monotonic timestamp of the current batch
+        """
+        self._cache = {k: v for k, v in self._cache.items() if v[1] > now}
+
+    def _cache_key(self, file_path: str) -> str:
+        """
+        Cache key of a file: its name, a sha256 of its bytes and the parse options.
+        A rewritten file or another file with the same name no longer hits a stale entry.
+        :param file_path: The path to the file to be parsed
+        """
+        digest = _file_sha256(file_path)
+        return f"{os.path.basename(file_path)}:{digest}:{int(self.use_mineru)}{int(self.to_markdown)}"
+
+    def _lookup_cache(self, key: str, now: float, file_name: Optional[str] = None):
+        """
+        Return cached data for the key if still valid, otherwise None
+        :param key: Cache key, see _cache_key
+        :param now: Monotonic timestamp of the current batch
+        :param file_name: File name used in log messages
+        """
+        file_name = file_name or key
+        entry = self._cache.get(key)
+        if entry is not None and entry[1] > now:
+            logger.info(f"✅ [Cache Hit] Using cached data for {file_name}")
+            return entry[0]
+        logger.info(f"⏳ [Cache Miss] No cached data for {file_name}, parsing...")
+        return None
+
+    def _get_or_parse(self, file_path: str, now: float):
+        """
+        Return cached data for the file if still valid, otherwise parse and cache it
+        :param file_path: The path to the file to be parsed
+        :param now: Monotonic timestamp of the current batch
+        """
+        if self.ttl <= 0:
+            return self._parse_file(file_path)  # caching disabled: no hashing, no lookup
+        key = self._cache_key(file_path)
+        parsed_data = self._lookup_cache(key, now, os.path.basename(file_path))
+        if parsed_data is None:
+            self._purge_expired(now)
+            parsed_data = self._parse_file(file_path)
+            self.set_data(key, parsed_data, now)
+        return parsed_data
+
+    def _get_or_parse_many(self, file_paths: List[str], now: float) -> list:
+        """
+        Resolve a batch of files, parsing cache misses concurrently when max_workers > 1.
+        Cache reads and writes stay on the calling thread; results keep the input order.
+        :param file_paths: The paths to the files to be parsed
+        :param now: Monotonic timestamp of the current batch
+        """
+        if self.max_workers <= 1 or len(file_paths) <= 1:
+            return [self._get_or_parse(f, now) for f in file_paths]
+
+        results = [None] * len(file_paths)
+        misses: Dict[str, List[int]] = {}
+        for i, f in enumerate(file_paths):
+            if self.ttl <= 0:
+                # caching disabled: skip hashing, only a path listed twice is parsed once
+                misses.setdefault(f, []).append(i)
+                continue
+            key = self._cache_key(f)
+            if key in misses:
+                misses[key].append(i)
+                continue
+            cached = self._lookup_cache(key, now, os.path.basename(f))
+            if cached is None:
+                misses[key] = [i]
+            else:
+                results[i] = cached
+        if not misses:
+            return results
+
+        self._purge_expired(now)
+        if self.use_processes:
+            executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            submit = functools.partial(
+                executor.submit,
+                _parse_one_file,
+                use_mineru=self.use_mineru,
+                to_markdown=self.to_markdown,
+                domain=self.domain,
             )
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            submit = functools.partial(executor.submit, self._parse_file)
+        with executor:
+            futures = {
+                key: submit(file_paths[indexes[0]])
+                for key, indexes in misses.items()
+            }
+            for key, future in futures.items():
+                parsed_data = future.result()
+                self.set_data(key, parsed_data, now)
+                for i in misses[key]:
+                    results[i] = parsed_data
+        return results
 
     def get_data(self):
         """
@@ -154,80 +348,22 @@ class DataMax(BaseLife):
         :return: A list of parsed data if the file path is a directory, otherwise a single parsed data.
         """
         try:
+            # one monotonic snapshot per batch, shared by every TTL check below
+            now = time.monotonic()
             if isinstance(self.file_path, list):
-                parsed_data = []
-                for f in self.file_path:
-                    file_name = os.path.basename(f)
-                    if (
-                        file_name in self._cache
-                        and self._cache[file_name]["ttl"] > time.time()
-                    ):
-                        logger.info(f"✅ [Cache Hit] Using cached data for {file_name}")
-                        parsed_data.append(self._cache[file_name]["data"])
-                    else:
-                        logger.info(
-                            f"⏳ [Cache Miss] No cached data for {file_name}, parsing..."
-                        )
-                        self._cache = {
-                            k: v
-                            for k, v in self._cache.items()
-                            if v["ttl"] > time.time()
-                        }
-                        res_data = self._parse_file(f)
-                        parsed_data.append(res_data)
-                        self.set_data(file_name, res_data)
-                return parsed_data
+                return self._get_or_parse_many(self.file_path, now)
 
             elif isinstance(self.file_path, str) and os.path.isfile(self.file_path):
-                file_name = os.path.basename(self.file_path)
-                if (
-                    file_name in self._cache
-                    and self._cache[file_name]["ttl"] > time.time()
-                ):
-                    logger.info(f"✅ [Cache Hit] Using cached data for {file_name}")
-                    self.parsed_data = self._cache[file_name]["data"]
-                    return self.parsed_data
-                else:
-                    logger.info(
-                        f"⏳ [Cache Miss] No cached data for {file_name}, parsing..."
-                    )
-                    self._cache = {
-                        k: v for k, v in self._cache.items() if v["ttl"] > time.time()
-                    }
-                    parsed_data = self._parse_file(self.file_path)
-                    self.parsed_data = parsed_data
-                    self.set_data(file_name, parsed_data)
-                    return parsed_data
+                self.parsed_data = self._get_or_parse(self.file_path, now)
+                return self.parsed_data
 
             elif isinstance(self.file_path, str) and os.path.isdir(self.file_path):
                 file_list = [
                     str(file) for file in list(Path(self.file_path).rglob("*.*"))
                 ]
-                parsed_data = []
-                for f in file_list:
-                    if os.path.isfile(f):
-                        file_name = os.path.basename(f)
-                        if (
-                            file_name in self._cache
-                            and self._cache[file_name]["ttl"] > time.time()
-                        ):
-                            logger.info(
-                                f"✅ [Cache Hit] Using cached data for {file_name}"
-                            )
-                            parsed_data.append(self._cache[file_name]["data"])
-                        else:
-                            logger.info(
-                                f"⏳ [Cache Miss] No cached data for {file_name}, parsing..."
-                            )
-                            self._cache = {
-                                k: v
-                                for k, v in self._cache.items()
-                                if v["ttl"] > time.time()
-                            }
-                            res_data = self._parse_file(f)
-                            parsed_data.append(res_data)
-                            self.set_data(file_name, res_data)
-                return parsed_data
+                return self._get_or_parse_many(
+                    [f for f in file_list if os.path.isfile(f)], now
+                )
             else:
                 raise ValueError("Invalid file path.")
 
@@ -361,6 +497,11 @@ class DataMax(BaseLife):
         messages: list = None,
         interactive_tree: bool = False,
         custom_domain_tree: Optional[List[Dict[str, Any]]] = None,
+        answer_cache_path: Optional[str] = None,
+        use_batch_api: bool = False,
+        one_shot_qa: bool = False,
+        parallel_domain_tree: bool = False,
+        batch_answers_by_page: bool = False,
     ):
         """
         Generate pre-labeling data based on processed document content instead of file path
@@ -391,6 +532,12 @@ class DataMax(BaseLife):
                     "label": "2 一级领域标签(无子标签)"
                 }
             ]
+        :param answer_cache_path: Optional SQLite file caching generated answers across runs
+        :param use_batch_api: Submit question/answer generation as Batch API jobs (cheaper, up to 24h)
+        :param one_shot_qa: Generate questions and answers in a single LLM call per chunk;
+                    cannot be combined with messages, use_batch_api or answer_cache_path
+        :param parallel_domain_tree: Build the domain tree of long texts from concurrently generated sections
+        :param batch_answers_by_page: Answer all questions of one chunk in a single LLM call
         :return: List of QA pairs
         """
         import datamax.utils.qa_generator as qa_gen
@@ -461,6 +608,11 @@ class DataMax(BaseLife):
                     interactive_tree=interactive_tree,
                     custom_domain_tree=custom_domain_tree,
                     use_mineru=self.use_mineru,  # 传递use_mineru参数
+                    answer_cache_path=answer_cache_path,
+                    use_batch_api=use_batch_api,
+                    one_shot_qa=one_shot_qa,
+                    parallel_domain_tree=parallel_domain_tree,
+                    batch_answers_by_page=batch_answers_by_page,
             )
             if self.parsed_data is not None and isinstance(self.parsed_data, dict):
                 # 打点：成功 DATA_LABELLED
@@ -503,7 +655,8 @@ class DataMax(BaseLife):
 
     def save_label_data(self, label_data: list, save_file_name: str = "qa_pairs"):
         """
-        Save label data to file.
+        Save label data to file as compact JSONL (no spaces after ',' and ':'),
+        written by orjson when installed and by the json module otherwise.
         :param label_data: Label data to be saved.
         :param save_file_name: File name to save the label data.
         """
@@ -515,9 +668,19 @@ class DataMax(BaseLife):
             else:
                 save_file_name = "label_data"
         if isinstance(label_data, list):
-            with open(save_file_name + ".jsonl", "w", encoding="utf-8") as f:
-                for qa_entry in label_data:
-                    f.write(json.dumps(qa_entry, ensure_ascii=False) + "\n")
+            if orjson is not None:
+                # orjson writes UTF-8 bytes directly, no ensure_ascii escaping pass
+                with open(save_file_name + ".jsonl", "wb") as f:
+                    for qa_entry in label_data:
+                        f.write(orjson.dumps(qa_entry) + b"\n")
+            else:
+                with open(save_file_name + ".jsonl", "w", encoding="utf-8") as f:
+                    for qa_entry in label_data:
+                        # same compact separators as orjson so both paths write identical lines
+                        f.write(
+                            json.dumps(qa_entry, ensure_ascii=False, separators=(",", ":"))
+                            + "\n"
+                        )
             logger.info(
                 f"✅ [Label Data Saved] Label data saved to {save_file_name}.jsonl"
             )
@@ -586,6 +749,8 @@ class DataMax(BaseLife):
         :param chunk_overlap: Number of overlapping characters between chunks
         :return: List of split text
         """
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
@@ -657,17 +822,7 @@ class DataMax(BaseLife):
         :param file_path: The path to the file to be parsed.
         :return: The parsed data.
         """
-        try:
-            parser = ParserFactory.create_parser(
-                use_mineru=self.use_mineru,
-                file_path=file_path,
-                to_markdown=self.to_markdown,
-                domain=self.domain,
-            )
-            if parser:
-                return parser.parse(file_path=file_path)
-        except Exception as e:
-            raise e
+        return _parse_one_file(file_path, self.use_mineru, self.to_markdown, self.domain)
 
 
 if __name__ == "__main__":
@@ -19,15 +19,15 @@ class EpubParser(BaseLife):
     def read_epub_file(file_path: str) -> str:
         try:
             book = epub.read_epub(file_path)
-            content = ""
+            parts = []
             for item in book.get_items():
                 if item.get_type() == ebooklib.ITEM_DOCUMENT:
                     chapter_content = item.get_content().decode("utf-8")
                     soup = BeautifulSoup(chapter_content, "html.parser")
                     text = soup.get_text()
                     text = text.replace("\u3000", " ")
-                    content += text
-            return content
+                    parts.append(text)
+            return "".join(parts)
         except Exception as e:
             raise e
 
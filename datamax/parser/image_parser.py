@@ -1,15 +1,10 @@
 import os
 import pathlib
-import sys
 
 from datamax.utils import setup_environment
 import dashscope
 from typing import Optional
 
-
-
-ROOT_DIR: pathlib.Path = pathlib.Path(__file__).parent.parent.parent.resolve()
-sys.path.insert(0, str(ROOT_DIR))
 from PIL import Image
 
 from datamax.parser.base import BaseLife
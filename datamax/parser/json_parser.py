@@ -3,6 +3,11 @@ import json
 from datamax.parser.base import BaseLife, MarkdownOutputVo
 from datamax.utils.lifecycle_types import LifeType
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class JsonParser(BaseLife):
 
@@ -13,8 +18,22 @@ class JsonParser(BaseLife):
     @staticmethod
     def read_json_file(file_path: str) -> str:
         """Read and pretty print a JSON file."""
+        has_float = False
+
+        def _float(value):
+            nonlocal has_float
+            has_float = True
+            return float(value)
+
         with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+            data = json.load(f, parse_float=_float, parse_constant=_float)
+        # json.dumps(indent=...) runs the pure-Python encoder; orjson gives the same bytes in C
+        # except for floats (1e+16 vs 1e16, NaN as null), so documents with floats keep json
+        if orjson is not None and not has_float:
+            try:
+                return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode("utf-8")
+            except TypeError:
+                pass  # integers beyond 64 bits or lone surrogates
         return json.dumps(data, indent=2, ensure_ascii=False)
 
     def parse(self, file_path: str) -> MarkdownOutputVo:
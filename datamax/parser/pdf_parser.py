@@ -1,14 +1,24 @@
 import os
 import subprocess
+from pathlib import Path
 from typing import Union
 
-from langchain_community.document_loaders import PyMuPDFLoader
+import fitz
 from loguru import logger
 
 from datamax.parser.base import BaseLife, MarkdownOutputVo
 from datamax.utils.lifecycle_types import LifeType
 from datamax.utils.mineru_operator import pdf_processor
 
+# 可选依赖（pip install pydatamax[pdf-markdown]）：仅在 to_markdown=True 时用于非 MinerU 路径，
+# 输出保留结构的 Markdown；默认仍输出纯文本层，安装与否不改变默认结果
+try:
+    import pymupdf4llm
+
+    HAS_PYMUPDF4LLM = True
+except ImportError:
+    HAS_PYMUPDF4LLM = False
+
 
 class PdfParser(BaseLife):
 
@@ -16,12 +26,14 @@ class PdfParser(BaseLife):
         self,
         file_path: Union[str, list],
         use_mineru: bool = False,
-        domain: str = "Technology"
+        domain: str = "Technology",
+        to_markdown: bool = False,
     ):
         super().__init__(domain=domain)
 
         self.file_path = file_path
         self.use_mineru = use_mineru
+        self.to_markdown = to_markdown
 
     def mineru_process(self, input_pdf_filename, output_dir):
         proc = None
@@ -67,15 +79,24 @@ class PdfParser(BaseLife):
     @staticmethod
     def read_pdf_file(file_path) -> str:
         try:
-            pdf_loader = PyMuPDFLoader(file_path)
-            pdf_documents = pdf_loader.load()
-            result_text = ""
-            for page in pdf_documents:
-                result_text += page.page_content
-            return result_text
+            # read the text layer with PyMuPDF directly: no LangChain Document per page;
+            # strip each page like PyMuPDFLoader did so the output stays the same
+            with fitz.open(file_path) as doc:
+                return "".join(page.get_text().strip() for page in doc)
         except Exception as e:
             raise e
 
+    @staticmethod
+    def read_pdf_markdown(file_path) -> str:
+        """
+        Convert the text layer to structure-preserving Markdown with pymupdf4llm,
+        falling back to plain text when it is not installed.
+        """
+        if not HAS_PYMUPDF4LLM:
+            logger.warning("⚠️ 未安装 pymupdf4llm (pip install pydatamax[pdf-markdown])，PDF按纯文本输出")
+            return PdfParser.read_pdf_file(file_path)
+        return pymupdf4llm.to_markdown(file_path)
+
     def parse(self, file_path: str) -> MarkdownOutputVo:
 
         lc_start = self.generate_lifecycle(
@@ -101,13 +122,15 @@ class PdfParser(BaseLife):
                 # todo: 是否有必要跟api的默认保存路径保持一致
                 output_mineru = f"{output_dir}/markdown/{output_folder_name}.md"
 
-                if os.path.exists(output_mineru):
-                    mk_content = open(output_mineru, "r", encoding="utf-8").read()
-                else:
+                # one open() instead of exists() + open(): no extra stat, no race in between
+                try:
+                    mk_content = Path(output_mineru).read_text(encoding="utf-8")
+                except FileNotFoundError:
                     mk_content = pdf_processor.process_pdf(file_path)
+            elif self.to_markdown:
+                mk_content = self.read_pdf_markdown(file_path=file_path)
             else:
-                content = self.read_pdf_file(file_path=file_path)
-                mk_content = content
+                mk_content = self.read_pdf_file(file_path=file_path)
 
             # —— 生命周期：处理完成 —— #
             lc_end = self.generate_lifecycle(
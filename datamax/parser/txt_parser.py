@@ -1,3 +1,4 @@
+import io
 from typing import Union
 
 import chardet
@@ -28,8 +29,12 @@ class TxtParser(BaseLife):
         :return: str: Txt file contents.
         """
         try:
-            encoding = TxtParser.detect_encoding(file_path)
-            with open(file_path, "r", encoding=encoding) as file:
+            # read the bytes once and decode them in memory instead of reopening the file
+            with open(file_path, "rb") as f:
+                raw = f.read()
+            encoding = chardet.detect(raw)["encoding"]
+            # TextIOWrapper keeps open()'s universal newline handling
+            with io.TextIOWrapper(io.BytesIO(raw), encoding=encoding) as file:
                 return file.read()
         except Exception as e:
             raise e
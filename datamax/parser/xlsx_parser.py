@@ -1,8 +1,6 @@
-import multiprocessing
 import os
-import time
+import threading
 import warnings
-from multiprocessing import Queue
 
 import pandas as pd
 from loguru import logger
@@ -14,11 +12,12 @@ warnings.filterwarnings("ignore")
 
 
 class XlsxParser(BaseLife):
-    """XLSX解析器 - 使用pandas读取并转换为markdown，支持多进程处理"""
+    """XLSX解析器 - 使用pandas读取并转换为markdown，支持超时控制"""
 
-    def __init__(self, file_path, domain: str = "Technology"):
+    def __init__(self, file_path, domain: str = "Technology", timeout: int = 60):
         super().__init__(domain=domain)
         self.file_path = file_path
+        self.timeout = timeout
         logger.info(f"🚀 XlsxParser初始化完成 - 文件路径: {file_path}")
 
     def _parse_with_pandas(self, file_path: str) -> str:
@@ -46,11 +45,12 @@ class XlsxParser(BaseLife):
             markdown_content = ""
 
             if isinstance(df, dict):
+                parts = []
                 # 多个工作表
                 logger.info(f"📑 检测到多个工作表，共 {len(df)} 个")
                 for sheet_name, sheet_df in df.items():
                     logger.debug(f"📋 处理工作表: {sheet_name}, 形状: {sheet_df.shape}")
-                    markdown_content += f"## 工作表: {sheet_name}\n\n"
+                    parts.append(f"## 工作表: {sheet_name}\n\n")
 
                     if not sheet_df.empty:
                         # 清理数据：移除完全为空的行和列
@@ -58,16 +58,17 @@ class XlsxParser(BaseLife):
 
                         if not sheet_df.empty:
                             sheet_markdown = sheet_df.to_markdown(index=False)
-                            markdown_content += sheet_markdown + "\n\n"
+                            parts.append(sheet_markdown + "\n\n")
                             logger.debug(
                                 f"✅ 工作表 {sheet_name} 转换完成，有效数据形状: {sheet_df.shape}"
                             )
                         else:
-                            markdown_content += "*该工作表无有效数据*\n\n"
+                            parts.append("*该工作表无有效数据*\n\n")
                             logger.warning(f"⚠️ 工作表 {sheet_name} 清理后无有效数据")
                     else:
-                        markdown_content += "*该工作表为空*\n\n"
+                        parts.append("*该工作表为空*\n\n")
                         logger.warning(f"⚠️ 工作表 {sheet_name} 为空")
+                markdown_content = "".join(parts)
             else:
                 # 单个工作表
                 logger.info(f"📄 单个工作表，形状: {df.shape}")
@@ -105,7 +106,7 @@ class XlsxParser(BaseLife):
             logger.error(f"💥 pandas读取Excel失败: {str(e)}")
             raise
 
-    def _parse(self, file_path: str, result_queue: Queue) -> dict:
+    def _parse(self, file_path: str) -> dict:
         """解析Excel文件的核心方法"""
         logger.info(f"🎬 开始解析Excel文件: {file_path}")
 
@@ -146,31 +147,14 @@ class XlsxParser(BaseLife):
             output_vo.add_lifecycle(lc_end)
 
             result = output_vo.to_dict()
-            result_queue.put(result)
             logger.info(f"🏆 Excel文件解析完成: {file_path}")
             logger.debug(f"🔑 返回结果键: {list(result.keys())}")
-
-            time.sleep(0.5)  # 给队列一点时间
             return result
 
         except Exception as e:
             # —— 生命周期：处理失败 —— #
             try:
-                lc_fail = self.generate_lifecycle(
-                    source_file=file_path,
-                    domain=self.domain,
-                    usage_purpose="Documentation",
-                    life_type=LifeType.DATA_PROCESS_FAILED,
-                )
-                logger.debug("⚙️ DATA_PROCESS_FAILED 生命周期已生成")
-                # 如果需要，也可以把它加到 error_result 里：
-                # error_result = {"error": str(e), "file_path": file_path, "lifecycle":[lc_fail.to_dict()]}
-            except Exception:
-                pass
-
-            # —— 生命周期：处理失败 —— #
-            try:
-                lc_fail = self.generate_lifecycle(
+                self.generate_lifecycle(
                     source_file=file_path,
                     domain=self.domain,
                     usage_purpose="Documentation",
@@ -181,19 +165,16 @@ class XlsxParser(BaseLife):
                 pass
 
             logger.error(f"💀 解析Excel文件失败: {file_path}, 错误: {str(e)}")
-            # 将错误也放入队列
-            error_result = {
-                "error": str(e),
-                "file_path": file_path,
-                # 额外把失败的 lifecycle 也一起返回，测试中可选校验
-                "lifecycle": [lc_fail.to_dict()] if "lc_fail" in locals() else [],
-            }
-            result_queue.put(error_result)
             raise
 
     def parse(self, file_path: str) -> dict:
-        """解析Excel文件 - 支持多进程和超时控制"""
-        logger.info(f"🚀 启动Excel解析进程 - 文件: {file_path}")
+        """
+        解析Excel文件 - 在守护线程中执行并进行超时控制
+
+        超时后解析被放弃而不是被终止：工作线程会在后台继续运行直到读取结束，
+        但它是守护线程，不会阻止解释器退出。
+        """
+        logger.info(f"🚀 启动Excel解析 - 文件: {file_path}")
 
         try:
             # 验证文件存在
@@ -205,12 +186,25 @@ class XlsxParser(BaseLife):
             if not file_path.lower().endswith((".xlsx", ".xls")):
                 logger.warning(f"⚠️ 文件扩展名不是Excel格式: {file_path}")
 
-            result_queue = Queue()
-            process = multiprocessing.Process(
-                target=self._parse, args=(file_path, result_queue)
-            )
-            process.start()
-            logger.debug(f"⚡ 启动子进程，PID: {process.pid}")
+            # 线程代替子进程：无需fork和重新导入，结果也无需跨进程序列化；
+            # 守护线程保证超时后仍在运行的解析不会阻塞解释器退出
+            outcome = {}
+
+            def _run():
+                try:
+                    outcome["result"] = self._parse(file_path)
+                except BaseException as e:
+                    outcome["error"] = e
+
+            worker = threading.Thread(target=_run, name="xlsx-parse", daemon=True)
+            worker.start()
+            worker.join(self.timeout)
+            if worker.is_alive():
+                logger.error(f"⏰ Excel解析超时({self.timeout}秒)，已放弃该解析: {file_path}")
+                raise TimeoutError(f"Excel解析超时({self.timeout}秒): {file_path}")
+            if "error" in outcome:
+                raise outcome["error"]
+            return outcome["result"]
 
         except Exception as e:
             logger.error(
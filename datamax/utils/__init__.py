@@ -11,6 +11,7 @@ try:
         HAS_UNO,
         UnoManager,
         cleanup_uno_manager,
+        convert_many_with_uno,
         convert_with_uno,
         get_uno_manager,
         uno_manager_context,
@@ -20,6 +21,7 @@ except ImportError:
     UnoManager = None
     get_uno_manager = None
     convert_with_uno = None
+    convert_many_with_uno = None
     cleanup_uno_manager = None
     uno_manager_context = None
 
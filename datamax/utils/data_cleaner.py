@@ -22,6 +22,22 @@ def suppress_stdout():
 with suppress_stdout():
     import jionlp as jio
 
+# Patterns used on every cleaned text, compiled once at import
+MULTI_NEWLINE_RE = re.compile(r"\n+")
+MULTI_SPACE_RE = re.compile(r" {2,}")
+INVISIBLE_CHARS_RE = re.compile(r"[\x00-\x09\x0b-\x1f\x7f-\xa0]")
+DIGIT_RE = re.compile(r"\d")
+CUSTOMER_NUMBER_RE = re.compile(r"\d+-\d+-\d+")
+BANK_ID_RE = re.compile(
+    r"\b(?:(?:\d{4}[ -]?){4}\d{3}|(?:\d{4}[ -]?){3}\d{4}|(?:4\d{3}|5[1-5]\d{2}|6[045]\d{2})(?:[ -]?\d{4}){3}|3[47]\d{2}[ -]?\d{6}[ -]?\d{5})\b"
+)
+REFERENCE_RES = [
+    re.compile(r"([A-Z][a-z]+(?:, [A-Z](?:\.[a-z]*)?)+(?: et al\.)? $\d{4}$[^\n]+)"),  # APA format
+    re.compile(r"($$\d+$$[^\n]+)"),  # Numbered references like [1]
+    re.compile(r"(DOI:\s?\S+|https?://\S+)"),  # DOI/URL
+    re.compile(r"([A-Z][a-z]+, [A-Z]\.?,? & [A-Z][a-z]+, [A-Z]\. \d{4}[^\n]+)"),  # Multi-author APA
+]
+
 
 class AbnormalCleaner:
     def __init__(self, parsed_data):
@@ -35,18 +51,9 @@ class AbnormalCleaner:
         Returns:
             str: Extracted reference text (same as self.parsed_data)
         """
-        patterns = [
-            r"([A-Z][a-z]+(?:, [A-Z](?:\.[a-z]*)?)+(?: et al\.)? $\d{4}$[^\n]+)",  # APA format
-            r"($$\d+$$[^\n]+)",  # Numbered references like [1]
-            r"(DOI:\s?\S+|https?://\S+)",  # DOI/URL
-            r"([A-Z][a-z]+, [A-Z]\.?,? & [A-Z][a-z]+, [A-Z]\. \d{4}[^\n]+)",  # Multi-author APA
-        ]
         references = []
-        for pattern in patterns:
-            try:
-                references.extend(re.findall(pattern, self.parsed_data))
-            except re.error as e:
-                print(f"Regex error {pattern}: {e}")
+        for pattern in REFERENCE_RES:
+            references.extend(pattern.findall(self.parsed_data))
 
         # Assign extraction results to parsed_data (each item on a separate line)
         self.parsed_data = "\n".join(
@@ -67,13 +74,13 @@ class AbnormalCleaner:
 
     def convert_newlines(self):
         """Convert \r to \n and multiple \n to a single \n"""
-        self.parsed_data = re.sub(r"\r", "", self.parsed_data)
-        self.parsed_data = re.sub(r"\n+", "\n", self.parsed_data)
+        self.parsed_data = self.parsed_data.replace("\r", "")
+        self.parsed_data = MULTI_NEWLINE_RE.sub("\n", self.parsed_data)
         return self.parsed_data
 
     def single_space(self):
         """Convert strings with more than 2 spaces to a single space"""
-        self.parsed_data = re.sub(r" {2,}", " ", self.parsed_data)
+        self.parsed_data = MULTI_SPACE_RE.sub(" ", self.parsed_data)
         return self.parsed_data
 
     def tabs_to_spaces(self):
@@ -83,9 +90,7 @@ class AbnormalCleaner:
 
     def remove_invisible_chars(self):
         """Remove invisible ASCII characters"""
-        self.parsed_data = re.sub(
-            r"[\x00-\x09\x0b-\x1f\x7f-\xa0]", "", self.parsed_data
-        )
+        self.parsed_data = INVISIBLE_CHARS_RE.sub("", self.parsed_data)
         return self.parsed_data
 
     def simplify_chinese(self):
@@ -192,7 +197,7 @@ class TextFilter:
         """Filter by numeric content"""
         text = self.parsed_data
         total_chars = len(text)
-        numeric_chars = len(re.findall(r"\d", text))
+        numeric_chars = len(DIGIT_RE.findall(text))
         if numeric_chars / total_chars > threshold:
             return False
         return True
@@ -227,13 +232,11 @@ class PrivacyDesensitization:
 
     def replace_customer_number(self, token="COSCO_NUMBER"):
         # Customer service hotlines are not easy to match and are not considered private data
-        self.parsed_data = re.sub(r"\d+-\d+-\d+", token, self.parsed_data)
+        self.parsed_data = CUSTOMER_NUMBER_RE.sub(token, self.parsed_data)
         return self.parsed_data
 
     def replace_bank_id(self, token="COSCO_NUMBER"):
         # Match bank card numbers and replace
-        BANK_ID_PATTERN = r"\b(?:(?:\d{4}[ -]?){4}\d{3}|(?:\d{4}[ -]?){3}\d{4}|(?:4\d{3}|5[1-5]\d{2}|6[045]\d{2})(?:[ -]?\d{4}){3}|3[47]\d{2}[ -]?\d{6}[ -]?\d{5})\b"
-
         def luhn_check(card_number):
             digits = [int(d) for d in card_number if d.isdigit()]
             if len(digits) not in (13, 15, 16, 19):
@@ -242,11 +245,12 @@ class PrivacyDesensitization:
             checksum += sum(sum(divmod(d * 2, 10)) for d in digits[-2::-2])
             return checksum % 10 == 0
 
-        bank_card_numbers = re.findall(BANK_ID_PATTERN, self.parsed_data)
+        bank_card_numbers = BANK_ID_RE.findall(self.parsed_data)
 
         for card_number in bank_card_numbers:
             if luhn_check(card_number):
-                self.parsed_data = re.sub(card_number, token, self.parsed_data)
+                # card numbers are digits, spaces and dashes: a plain replace is enough
+                self.parsed_data = self.parsed_data.replace(card_number, token)
         return self.parsed_data
 
     def replace_phone_number(self, token="COSCO_NUMBER"):
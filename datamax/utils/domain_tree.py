@@ -8,68 +8,85 @@ class DomainTree:
     """
     def __init__(self, tree_data: Optional[List[Dict[str, Any]]] = None) -> None:
         self.tree: List[Dict[str, Any]] = tree_data or []
-        
+        # label -> (node, parent node or None, path), built lazily, dropped on every change
+        self._index: Optional[Dict[str, tuple]] = None
+
+    def _build_index(self) -> Dict[str, tuple]:
+        #first occurrence in depth-first order wins, same as a linear search
+        #explicit stack instead of recursion: no frame per node, no RecursionError on deep trees
+        index: Dict[str, tuple] = {}
+        stack = [(node, None, None) for node in reversed(self.tree)]
+        while stack:
+            node, parent, prefix = stack.pop()
+            label = node.get("label", "")
+            path = label if prefix is None else prefix + "/" + label
+            if label not in index:
+                index[label] = (node, parent, path)
+            if "child" in node:
+                stack.extend((child, node, path) for child in reversed(node["child"]))
+        return index
+
+    def _lookup(self, label: str) -> Optional[tuple]:
+        if self._index is None:
+            self._index = self._build_index()
+        return self._index.get(label)
+
+    def _invalidate(self) -> None:
+        self._index = None
+
     #add node
     def add_node(self, label: str, parent_label: Optional[str] = None) -> bool:
         if parent_label is None:
             self.tree.append({"label": label})
+            self._invalidate()
             return True
         parent = self.find_node(parent_label)
         if parent is not None:
             if "child" not in parent:
                 parent["child"] = []
             parent["child"].append({"label": label})
+            self._invalidate()
             return True
         return False
 
     #remove node
     def remove_node(self, label: str) -> bool:
-        for index, node in enumerate(self.tree):
-            if node.get("label") == label:
-                del self.tree[index]
-                return True
-        for node in self.tree:
-            if "child" in node:
-                for child_index, child in enumerate(node["child"]):
-                    if child.get("label") == label:
-                        del node["child"][child_index]
-                        return True
-        return False
+        entry = self._lookup(label)
+        if entry is None:
+            return False
+        node, parent, _ = entry
+        siblings = self.tree if parent is None else parent["child"]
+        for index, sibling in enumerate(siblings):
+            if sibling is node:
+                del siblings[index]
+                break
+        self._invalidate()
+        return True
 
     #update node
     def update_node(self, old_label: str, new_label: str) -> bool:
         node = self.find_node(old_label)
         if node:
             node["label"] = new_label
+            self._invalidate()
             return True
         return False
 
     #find node
     def find_node(self, label: str) -> Optional[Dict[str, Any]]:
-        for node in self.tree:
-            if node.get("label") == label:
-                return node
-            if "child" in node:
-                for child in node["child"]:
-                    if child.get("label") == label:
-                        return child
-        return None
+        entry = self._lookup(label)
+        return entry[0] if entry else None
 
     #find path
     def find_path(self, label: str) -> Optional[str]:
-        #recursive method need more parameters
-        def _find(tree: List[Dict[str, Any]], label: str, path: List[str]) -> Optional[List[str]]:
-            for node in tree:
-                current_path = path + [node.get("label", "")]
-                if node.get("label") == label:
-                    return current_path
-                if "child" in node:
-                    result = _find(node["child"], label, current_path)
-                    if result:
-                        return result
-            return None
-        result = _find(self.tree, label, [])
-        return "/".join(result) if result else None
+        entry = self._lookup(label)
+        return entry[2] if entry else None
+
+    def label_paths(self) -> Dict[str, str]:
+        #snapshot of label -> path for bulk lookups, same answers as find_path
+        if self._index is None:
+            self._index = self._build_index()
+        return {label: entry[2] for label, entry in self._index.items()}
 
         
     def to_json(self) -> List[Dict[str, Any]]:
@@ -77,6 +94,7 @@ class DomainTree:
 
     def from_json(self, json_data: List[Dict[str, Any]]) -> None:
         self.tree = json_data
+        self._invalidate()
 
     def visualize(self) -> str:
         """
@@ -137,6 +155,7 @@ class DomainTree:
                     new_node = {"label": node_name, "child": [child]}
                     # replace original child node
                     parent_node["child"][i] = new_node
+                    self._invalidate()
                     return True
                     
         return False
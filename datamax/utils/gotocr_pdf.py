@@ -1,8 +1,11 @@
 import argparse
 import ast
 import os
+import queue
 import re
+import threading
 from datetime import datetime
+from typing import Optional, Union
 
 import cv2
 import numpy as np
@@ -44,45 +47,71 @@ use_im_start_end = True
 image_token_len = 256
 
 
-def covert_pdf_to_image(image_path: str):
-    # step1: Convert PDF to images
-    imgs = []
-    with fitz.open(image_path) as pdf:
+def _render_page(page, zoom: float, max_side: int):
+    """Render and binarize one fitz page"""
+    # step1: Convert PDF page to image
+    # Magnify by up to four times, but keep the long edge within max_side:
+    # the GOT processor resizes to 1024 anyway, larger renders only cost time
+    scale = min(zoom, max_side / max(page.rect.width, page.rect.height))
+    mat = fitz.Matrix(scale, scale)
+    pm = page.get_pixmap(matrix=mat, alpha=False)
+
+    # wrap the pixmap buffer directly instead of copying it through PIL
+    pdf_img = np.frombuffer(pm.samples_mv, dtype=np.uint8).reshape(
+        pm.height, pm.width, pm.n
+    )
+    pdf_img = cv2.cvtColor(pdf_img, cv2.COLOR_RGB2BGR)
+
+    # step2: Process image
+    gray_img = cv2.cvtColor(pdf_img, cv2.COLOR_BGR2GRAY)
+
+    # Binarization processing
+    _, binary_img = cv2.threshold(
+        gray_img, 128, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
+    )
+
+    # denoise
+    return cv2.medianBlur(binary_img, 3)
+
+
+def iter_pdf_pages(
+    pdf_path: str,
+    zoom: float = 4,
+    max_side: int = 2048,
+    min_text_chars: Optional[int] = None,
+):
+    """
+    Render and binarize PDF pages in memory one at a time, in page order.
+    With min_text_chars set, a page whose text layer holds more characters than
+    that is yielded as its text (str) instead of being rendered.
+    """
+    with fitz.open(pdf_path) as pdf:
         for pg in range(0, pdf.page_count):
             page = pdf[pg]
-            mat = fitz.Matrix(4, 4)  # Magnify by four times throughout the process
-            pm = page.get_pixmap(matrix=mat, alpha=False)
-            # if pm.width > 2000 or pm.height > 2000:
-            #     pm = page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
+            if min_text_chars is not None:
+                text = page.get_text()
+                if len(text.strip()) > min_text_chars:
+                    yield text
+                    continue
+            yield _render_page(page, zoom, max_side)
 
-            img = Image.frombytes("RGB", [pm.width, pm.height], pm.samples)
-            img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-            imgs.append(img)
-
-    img_name = datetime.now().strftime("%Y%m%d%H%M%S")
-    # step2: Process images
-    output = "output"
-    img_paths = []
-    for index, pdf_img in enumerate(imgs):
-        # img processing
 
-        gray_img = cv2.cvtColor(pdf_img, cv2.COLOR_BGR2GRAY)
+def render_pdf_pages(pdf_path: str, zoom: float = 4, max_side: int = 2048):
+    """Render and binarize every PDF page in memory, in page order."""
+    return list(iter_pdf_pages(pdf_path, zoom=zoom, max_side=max_side))
 
-        # Binarization processing
-        _, binary_img = cv2.threshold(
-            gray_img, 128, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU
-        )
 
-        # denoise
-        filtered_img = cv2.medianBlur(binary_img, 3)
-        processed_img = filtered_img
+def covert_pdf_to_image(image_path: str, zoom: float = 4, max_side: int = 2048):
+    processed_imgs = render_pdf_pages(image_path, zoom=zoom, max_side=max_side)
 
-        os.makedirs(os.path.join(output, img_name), exist_ok=True)
+    img_name = datetime.now().strftime("%Y%m%d%H%M%S")
+    output = "output"
+    os.makedirs(os.path.join(output, img_name), exist_ok=True)
+    for index, processed_img in enumerate(processed_imgs):
         pdf_img_path = os.path.join(
             output, img_name, img_name + "_" + str(index) + ".jpg"
         )
         cv2.imwrite(pdf_img_path, processed_img)
-        img_paths.append([pdf_img_path, processed_img])
 
     return img_name
 
@@ -120,10 +149,14 @@ def initialize_model(model_path: str = "./GOT_weights/", gpu_id: int = 6):
     return model, tokenizer
 
 
-def eval_model(file: str, model, tokenizer, gpu_id: int = 6):
+def eval_model(file: Union[str, np.ndarray], model, tokenizer, gpu_id: int = 6):
     # Model
     # image = load_image(args.image_file)
-    image = Image.open(file).convert("RGB")
+    # accept either an image path or an in-memory page from render_pdf_pages
+    if isinstance(file, np.ndarray):
+        image = Image.fromarray(file).convert("RGB")
+    else:
+        image = Image.open(file).convert("RGB")
 
     w, h = image.size
     # print(image.size)
@@ -243,23 +276,89 @@ def convert_to_markdown(md_content, pdf_path):
 def main(image_list: str, pdf_path: str, model, tokenizer, gpu_id: int = 6):
     res_list = sorted_list_by_index(image_list)
 
-    outputs = ""
-    for file_path in res_list:
-        outputs += eval_model(
-            file=file_path, model=model, tokenizer=tokenizer, gpu_id=gpu_id
-        )
+    outputs = "".join(
+        eval_model(file=file_path, model=model, tokenizer=tokenizer, gpu_id=gpu_id)
+        for file_path in res_list
+    )
 
     convert_to_markdown(outputs, pdf_path)
     return outputs
 
 
-def generate_mathpix_markdown(pdf_path: str, model, tokenizer, gpu_id: int = 6):
-    image_list = covert_pdf_to_image(pdf_path)
-    outputs = main(
-        image_list=image_list,
-        pdf_path=pdf_path,
-        gpu_id=gpu_id,
-        model=model,
-        tokenizer=tokenizer,
+def _put_unless_stopped(page_queue: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put item on the bounded queue, giving up once stop is set; True if it was queued"""
+    while not stop.is_set():
+        try:
+            page_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _render_pages_into(
+    pdf_path: str,
+    page_queue: queue.Queue,
+    min_text_chars: Optional[int],
+    stop: threading.Event,
+):
+    """Producer: push rendered pages onto the queue, then a None sentinel; quits when stop is set"""
+    pages = iter_pdf_pages(pdf_path, min_text_chars=min_text_chars)
+    try:
+        for page_img in pages:
+            if not _put_unless_stopped(page_queue, page_img, stop):
+                return
+    except Exception as e:
+        _put_unless_stopped(page_queue, e, stop)
+        return
+    finally:
+        pages.close()  # closes the fitz document even when the consumer gave up early
+    _put_unless_stopped(page_queue, None, stop)
+
+
+def generate_mathpix_markdown(
+    pdf_path: str,
+    model,
+    tokenizer,
+    gpu_id: int = 6,
+    prefetch: int = 2,
+    force_ocr: bool = False,
+    min_text_chars: int = 200,
+):
+    # pages stay in memory: no jpg round-trip through ./output and no directory walk.
+    # A producer thread renders the next pages while the model is busy with the
+    # current one; the bounded queue keeps at most `prefetch` pages in memory.
+    # Born-digital pages (text layer longer than min_text_chars) skip the model
+    # unless force_ocr is set.
+    page_queue = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_render_pages_into,
+        args=(pdf_path, page_queue, None if force_ocr else min_text_chars, stop),
+        daemon=True,
     )
+    producer.start()
+
+    outputs = []
+    try:
+        while True:
+            page_img = page_queue.get()
+            if page_img is None:
+                break
+            if isinstance(page_img, Exception):
+                raise page_img
+            if isinstance(page_img, str):
+                outputs.append(page_img.strip() + "\n")
+                continue
+            outputs.append(
+                eval_model(file=page_img, model=model, tokenizer=tokenizer, gpu_id=gpu_id)
+            )
+    finally:
+        # on an error (e.g. eval_model raising) the producer may be blocked on the full
+        # queue: tell it to stop so it closes the PDF and exits instead of leaking
+        stop.set()
+        producer.join()
+
+    outputs = "".join(outputs)
+    convert_to_markdown(outputs, pdf_path)
     return outputs
@@ -3,7 +3,6 @@
 import json
 import os
 import re
-import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Any
 
@@ -12,7 +11,7 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from loguru import logger
 from tqdm import tqdm
 
-lock = threading.Lock()
+_JSON_FENCE_RE = re.compile(r"```json\s*\n([\s\S]*?)\n```")
 
 def get_instruction_prompt(question_number: int) -> str:
     """
@@ -185,7 +184,7 @@ def generate_multimodal_qa_with_dashscope(
                 logger.error("从API返回内容中未能提取到有效文本。")
                 return []
 
-            json_match = re.search(r"```json\n([\s\S]*?)\n```", text_content, re.DOTALL)
+            json_match = _JSON_FENCE_RE.search(text_content)
             if json_match:
                 json_str = json_match.group(1)
             else:
@@ -271,8 +270,7 @@ def generatr_qa_pairs(
             for future in pbar:
                 result = future.result()
                 if result:
-                    with lock:
-                        final_qa_list.extend(result)
+                    final_qa_list.extend(result)
                     pbar.set_postfix({"已生成QA": len(final_qa_list)})
 
     logger.success(f"处理完成! 共生成 {len(final_qa_list)} 个多模态问答对。")
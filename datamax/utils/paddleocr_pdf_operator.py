@@ -8,11 +8,10 @@ from datetime import datetime
 
 import cv2
 import numpy as np
-from PIL import Image
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "True"
+# repository root, only used to locate ocr_model_dir below
 ROOT_DIR: pathlib.Path = pathlib.Path(__file__).parent.parent.parent.resolve()
-sys.path.append(str(ROOT_DIR))
 
 from paddle.utils import try_import
 from paddleocr import PPStructure, save_structure_res
@@ -35,13 +34,16 @@ def recovery(img_path, output, use_gpu, gpu_id):
     with fitz.open(img_path) as pdf:
         for pg in range(0, pdf.page_count):
             page = pdf[pg]
-            mat = fitz.Matrix(2, 2)
-            pm = page.get_pixmap(matrix=mat, alpha=False)
-            if pm.width > 2000 or pm.height > 2000:
-                pm = page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
+            # pick the zoom from the page size up front instead of rendering
+            # at 2x and re-rendering at 1x when the result is too large
+            zoom = 1 if max(page.rect.width, page.rect.height) * 2 > 2000 else 2
+            pm = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
 
-            img = Image.frombytes("RGB", [pm.width, pm.height], pm.samples)
-            img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+            # wrap the pixmap buffer directly instead of copying it through PIL
+            img = np.frombuffer(pm.samples_mv, dtype=np.uint8).reshape(
+                pm.height, pm.width, pm.n
+            )
+            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
             imgs.append(img)
 
     img_name = datetime.now().strftime("%Y%m%d%H%M%S")
@@ -1,28 +1,144 @@
+import hashlib
 import json
 import os.path
+import random
 import re
+import sqlite3
 import threading
+import time
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, List, Any
 import uuid
 
 import requests
+from requests.adapters import HTTPAdapter
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import UnstructuredMarkdownLoader
 from loguru import logger
 from pyexpat.errors import messages
 from tqdm import tqdm  
 from dotenv import load_dotenv
 from datamax.utils.domain_tree import DomainTree   #for cache domain tree
 
-lock = threading.Lock()
+# optional: orjson parses LLM outputs several times faster than json;
+# its JSONDecodeError subclasses json.JSONDecodeError, so callers stay unchanged
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# one pooled session shared by all worker threads: keep-alive connections are reused
+# across LLM calls instead of a new TCP/TLS handshake per request
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=64, pool_maxsize=64))
+_SESSION.mount("http://", HTTPAdapter(pool_connections=64, pool_maxsize=64))
+
+# at most this many LLM requests in flight across all thread pools
+_LLM_CONCURRENCY = threading.Semaphore(32)
+# HTTP failures (429, 5xx, network) are retried only here, up to _LLM_MAX_ATTEMPTS
+# requests per call; the max_retries loops of the process_* functions re-ask only for
+# empty or unparseable replies and give up once llm_generator reports a failed request
+_LLM_MAX_ATTEMPTS = 5
+_LLM_RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+_LLM_BACKOFF_MAX = 30.0
+
+
+class _RateLimiter:
+    """Sliding one-minute window over requests (rpm) and estimated tokens (tpm)"""
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._calls = deque()  # (timestamp, tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0][0] >= 60:
+                    self._tokens -= self._calls.popleft()[1]
+                # an empty window always admits, so one oversized request cannot block forever
+                if not self._calls or (
+                    (self.rpm is None or len(self._calls) < self.rpm)
+                    and (self.tpm is None or self._tokens + tokens <= self.tpm)
+                ):
+                    self._calls.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                wait = 60 - (now - self._calls[0][0])
+            time.sleep(wait)
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+# proactive throttling to the account quota, off unless DASHSCOPE_RPM / DASHSCOPE_TPM are set
+_LLM_RPM = _env_int("DASHSCOPE_RPM")
+_LLM_TPM = _env_int("DASHSCOPE_TPM")
+_LIMITER = _RateLimiter(_LLM_RPM, _LLM_TPM) if (_LLM_RPM or _LLM_TPM) else None
+
+
+def _estimate_tokens(data: dict) -> int:
+    # utf-8 bytes / 3: about one token per CJK character, three ASCII characters per token
+    return sum(len(str(m.get("content", "")).encode("utf-8")) for m in data["messages"]) // 3
+
+
+def _retry_delay(response, attempt: int) -> float:
+    # the provider's Retry-After wins; otherwise exponential backoff with full jitter
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), _LLM_BACKOFF_MAX * 2)
+        except ValueError:
+            pass  # HTTP-date form, fall back to backoff
+    return random.uniform(0, min(_LLM_BACKOFF_MAX, 2 ** attempt))
+
+
+def _post_llm(base_url: str, headers: dict, data: dict, stream: bool = False):
+    """POST to the LLM API, retrying throttling (429), 5xx and network errors with backoff"""
+    tokens = _estimate_tokens(data) if _LIMITER is not None else 0
+    for attempt in range(_LLM_MAX_ATTEMPTS):
+        response = None
+        if _LIMITER is not None:
+            _LIMITER.acquire(tokens)
+        try:
+            with _LLM_CONCURRENCY:
+                response = _SESSION.post(
+                    base_url, headers=headers, json=data, timeout=120, stream=stream
+                )
+            if response.status_code not in _LLM_RETRY_STATUS:
+                response.raise_for_status()
+                return response
+            if attempt == _LLM_MAX_ATTEMPTS - 1:
+                response.raise_for_status()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == _LLM_MAX_ATTEMPTS - 1:
+                raise
+        delay = _retry_delay(response, attempt)
+        if response is not None:
+            # release the pooled connection before backing off (a streamed body holds it)
+            response.close()
+        logger.warning(
+            f"LLM请求受限或失败，{delay:.1f} 秒后重试 ({attempt + 2}/{_LLM_MAX_ATTEMPTS})"
+        )
+        # sleep outside the semaphore so waiting calls don't hold a slot
+        time.sleep(delay)
+
 
 # ====== API settings======
 # set your api key and base url in .env file
 API_KEY = os.getenv("DASHSCOPE_API_KEY", "your-api-key-here")
 BASE_URL = os.getenv("DASHSCOPE_BASE_URL")
 
+
 def complete_api_url(base_url: str) -> str:
     """
     Normalize the given base_url so that it ends with the OpenAI-style
@@ -36,9 +152,34 @@ def complete_api_url(base_url: str) -> str:
         url = f"{url}/chat/completions"
     return url
 
+
 # ------------prompt-----------------
-def get_system_prompt_for_match_label(tags_json, question):
-    system_prompt = f"""
+# templates are split on their ${name} placeholders once at import;
+# the builders below only join the pieces with the call's values
+_PLACEHOLDER_RE = re.compile(r"\$\{(\w+)\}")
+
+
+def _compile_prompt(template: str) -> list:
+    # [text, name, text, name, ..., text]
+    return _PLACEHOLDER_RE.split(template)
+
+
+def _render_prompt(parts: list, **values) -> str:
+    # odd positions are placeholder names; filled in one pass, so values are never re-scanned
+    return "".join(str(values[part]) if i % 2 else part for i, part in enumerate(parts))
+
+
+def _edit_prompt(template: str, edits: tuple) -> str:
+    # derive a prompt variant by exact replacements; a target missing after the base
+    # template is edited fails at import instead of silently keeping the old wording
+    for old, new in edits:
+        if old not in template:
+            raise ValueError(f"prompt edit target not found: {old!r}")
+        template = template.replace(old, new)
+    return template
+
+
+MATCH_LABEL_PROMPT = """
     # Role: 标签匹配专家
     - Description: 你是一名标签匹配专家，擅长根据给定的标签数组和问题数组，将问题打上最合适的领域标签。你熟悉标签的层级结构，并能根据问题的内容优先匹配二级标签，若无法匹配则匹配一级标签，若无法匹配最后打上"其他"标签。
 
@@ -93,23 +234,37 @@ def get_system_prompt_for_match_label(tags_json, question):
     ## Output Example:
     ```json
         [
-            {{
+            {
                 "question": "XSS为什么会在2003年后引起人们更多关注并被OWASP列为威胁榜首？",
                 "label": "2.2 XSS攻击"
-            }},
-            {{
+            },
+            {
                 "question": "这个问题与现有标签都不相关",
                 "label": "其他"
-            }}
+            }
         ]
     ```
     """
-    return system_prompt
+MATCH_LABEL_PROMPT_PARTS = _compile_prompt(MATCH_LABEL_PROMPT)
+# same instructions with the question array moved to the user turn: every batch then sends a
+# byte-identical system message, which the provider's prompt (KV) prefix cache can reuse
+# questions arrive as {"id", "question"} objects and replies are matched back by id, so a
+# question the model echoes reworded still gets its label
+MATCH_LABEL_SYSTEM_PROMPT_PARTS = _compile_prompt(
+    _edit_prompt(
+        MATCH_LABEL_PROMPT,
+        (
+            ("${question}", "（见用户消息）"),
+            ("每个元素包含 question、和 label 字段。", "每个元素包含 id、question 和 label 字段，id 与输入保持一致。"),
+            ("每个元素包含 question、label 字段", "每个元素包含 id、question、label 字段"),
+            ('"question": "XSS', '"id": 0,\n                "question": "XSS'),
+            ('"question": "这个问题', '"id": 1,\n                "question": "这个问题'),
+        ),
+    )
+)
 
 
-def get_system_prompt_for_domain_tree(text):
-    """Generate system prompt for domain tree task"""
-    system_prompt = f"""
+DOMAIN_TREE_PROMPT = """
         #  Role: 领域分类专家 & 知识图谱专家
         - Description:
         作为一名资深的领域分类专家和知识图谱专家，擅长从文本内容中提取核心主题，构建分类体系，
@@ -154,24 +309,23 @@ def get_system_prompt_for_domain_tree(text):
         ## OutputFormat:
         ```json
         [
-            {{
+            {
                 "label": "1 一级领域标签",
                 "child": [
-                    {{"label": "1.1 二级领域标签1"}},
-                    {{"label": "1.2 二级领域标签2"}}
+                    {"label": "1.1 二级领域标签1"},
+                    {"label": "1.2 二级领域标签2"}
                 ]
-            }},
-            {{
+            },
+            {
                 "label": "2 一级领域标签(无子标签)"
-            }}
+            }
         ]
         ```
     """
-    return system_prompt
+DOMAIN_TREE_PROMPT_PARTS = _compile_prompt(DOMAIN_TREE_PROMPT)
 
-def get_system_prompt_for_question(query_text, question_number):
-    """Generate system prompt for question generation task"""
-    system_prompt = f"""
+
+QUESTION_PROMPT = """
         # 角色使命
         你是一位专业的文本分析专家，擅长从复杂文本中提取关键信息并生成可用于模型微调的结构化数据（仅生成问题）。
 
@@ -215,12 +369,10 @@ def get_system_prompt_for_question(query_text, question_number):
         - 问题不要和材料本身相关，例如禁止出现作者、章节、目录等相关问题
         - 问题不得包含【报告、文章、文献、表格】中提到的这种话术，必须是一个自然的问题
     """
-    return system_prompt
+QUESTION_PROMPT_PARTS = _compile_prompt(QUESTION_PROMPT)
 
 
-def get_system_prompt_for_answer(text, query_question):
-    """Generate system prompt for answer generation task"""
-    system_prompt = f"""
+ANSWER_PROMPT = """
         # Role: 微调数据集生成专家
         ## Profile:
         - Description: 你是一名微调数据集生成专家，擅长从给定的内容中生成准确的问题答案，确保答案的准确性和相关性，你要直接回答用户问题，所有信息已内化为你的专业知识。
@@ -251,19 +403,163 @@ def get_system_prompt_for_answer(text, query_question):
         3. 答案必须充分、详细、包含所有必要的信息、适合微调大模型训练使用
         4. 答案中不得出现 ' 参考 / 依据 / 文献中提到 ' 等任何引用性表述，只需呈现最终结果
     """
-    return system_prompt
+ANSWER_PROMPT_PARTS = _compile_prompt(ANSWER_PROMPT)
+
+
+ANSWER_BATCH_PROMPT = """
+        # Role: 微调数据集生成专家
+        ## Profile:
+        - Description: 你是一名微调数据集生成专家，擅长从给定的内容中生成准确的问题答案，确保答案的准确性和相关性，你要直接回答用户问题，所有信息已内化为你的专业知识。
+
+        ## Skills   :
+        1. 答案必须基于给定的内容
+        2. 答案必须准确，不能胡编乱造
+        3. 答案必须与问题相关
+        4. 答案必须符合逻辑
+        5. 基于给定参考内容，用自然流畅的语言整合成一个完整答案，不需要提及文献来源或引用标记
+
+        ## Workflow:
+        1. Take a deep breath and work on this problem step-by-step.
+        2. 首先，分析给定的文件内容
+        3. 然后，从内容中提取关键信息
+        4. 接着，逐一为问题数组中的每个问题生成准确答案
+        5. 最后，确保答案的准确性和相关性
+
+        ## 参考内容：
+        ${text}
+
+        ## 问题数组
+        ${questions}
+
+        ## Constrains:
+        1. 答案必须基于给定的内容
+        2. 答案必须准确，必须与问题相关，不能胡编乱造
+        3. 答案必须充分、详细、包含所有必要的信息、适合微调大模型训练使用
+        4. 答案中不得出现 ' 参考 / 依据 / 文献中提到 ' 等任何引用性表述，只需呈现最终结果
+        5. 输出结果必须是一个数组，每个元素包含 question、answer 字段，question 必须与问题数组中的原文完全一致（只输出这个，不要输出任何其他无关内容）
+
+        ## Output Example:
+        ```json
+            [
+                {
+                    "question": "问题1",
+                    "answer": "问题1的答案"
+                },
+                {
+                    "question": "问题2",
+                    "answer": "问题2的答案"
+                }
+            ]
+        ```
+    """
+ANSWER_BATCH_PROMPT_PARTS = _compile_prompt(ANSWER_BATCH_PROMPT)
+
+
+QA_PAIRS_PROMPT = """
+        # 角色使命
+        你是一位专业的文本分析专家，擅长从复杂文本中提取关键信息并生成可用于模型微调的结构化数据（同时生成问题与答案）。
+
+        ## 核心任务
+        根据用户提供的文本，生成不少于 ${question_number} 个高质量问题，并为每个问题给出答案。
+
+        ## 约束条件（重要！）
+        - 问题必须基于文本内容直接生成，具有明确答案指向性
+        - 需覆盖文本的不同方面，禁止生成假设性、重复或相似问题
+        - 答案必须基于给定的内容，准确、充分、详细，不能胡编乱造
+        - 答案中不得出现 ' 参考 / 依据 / 文献中提到 ' 等任何引用性表述，只需呈现最终结果
+
+        ## 输出格式
+        - JSON 数组格式必须正确
+        - 字段名使用英文双引号
+        - 输出的 JSON 数组必须严格符合以下结构：
+        ```json
+        [{"question": "问题1", "answer": "问题1的答案"}, {"question": "问题2", "answer": "问题2的答案"}]
+        ```
+
+        ## 待处理文本
+        ${query_text}
+
+        ## 限制
+        - 必须按照规定的 JSON 格式输出，不要输出任何其他不相关内容
+        - 生成不少于${question_number}个高质量问答对
+        - 问题不要和材料本身相关，例如禁止出现作者、章节、目录等相关问题
+        - 问题不得包含【报告、文章、文献、表格】中提到的这种话术，必须是一个自然的问题
+    """
+QA_PAIRS_PROMPT_PARTS = _compile_prompt(QA_PAIRS_PROMPT)
+
+
+def _to_prompt_json(value) -> str:
+    # pre-serialized strings pass through untouched
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, indent=2)
+
+
+def get_system_prompt_for_match_label(tags_json, question):
+    """Generate system prompt for label matching, tags_json/question may be pre-serialized JSON strings"""
+    return _render_prompt(
+        MATCH_LABEL_PROMPT_PARTS,
+        tags_json=_to_prompt_json(tags_json),
+        question=_to_prompt_json(question),
+    )
+
+
+def get_static_label_system_prompt(tags_json):
+    """Generate the question-independent system prompt for label matching"""
+    return _render_prompt(MATCH_LABEL_SYSTEM_PROMPT_PARTS, tags_json=_to_prompt_json(tags_json))
+
+
+def get_system_prompt_for_domain_tree(text):
+    """Generate system prompt for domain tree task"""
+    return _render_prompt(DOMAIN_TREE_PROMPT_PARTS, text=text)
+
+
+def get_system_prompt_for_question(query_text, question_number):
+    """Generate system prompt for question generation task"""
+    return _render_prompt(QUESTION_PROMPT_PARTS, query_text=query_text, question_number=question_number)
+
+
+def get_system_prompt_for_answer(text, query_question):
+    """Generate system prompt for answer generation task"""
+    return _render_prompt(ANSWER_PROMPT_PARTS, text=text, query_question=query_question)
+
+
+def get_system_prompt_for_answers_batch(text, questions):
+    """Generate system prompt for answering several questions about the same text"""
+    questions_json = json.dumps(questions, ensure_ascii=False, indent=2)
+    return _render_prompt(ANSWER_BATCH_PROMPT_PARTS, text=text, questions=questions_json)
+
+
+def get_system_prompt_for_qa_pairs(query_text, question_number):
+    """Generate system prompt for generating questions together with their answers"""
+    return _render_prompt(QA_PAIRS_PROMPT_PARTS, query_text=query_text, question_number=question_number)
 
 
 # ------------spliter----------------
-def load_and_split_markdown(md_path: str, chunk_size: int, chunk_overlap: int) -> list:
+@lru_cache(maxsize=8)
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    # the splitter holds no per-call state: one instance per size pair is reused across files
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
+
+def load_and_split_markdown(
+    md_path: str, chunk_size: int, chunk_overlap: int, use_unstructured: bool = False
+) -> list:
     """
-    Parse Markdown using UnstructuredMarkdownLoader
+    Read a Markdown file and split it into chunks
     Chunking strategy that preserves original paragraph structure
 
     Args:
         md_path: Path to the markdown file
         chunk_size: Size of each chunk
         chunk_overlap: Overlap between chunks
+        use_unstructured: Partition with UnstructuredMarkdownLoader instead of reading the
+            raw text (slower, strips markdown syntax)
 
     Returns:
         List of document chunks
@@ -272,18 +568,22 @@ def load_and_split_markdown(md_path: str, chunk_size: int, chunk_overlap: int) -
         # Use LangChain's MarkdownLoader to load Markdown file
         file_name = os.path.basename(md_path)
         logger.info(f"开始切分Markdown文件: {file_name}")
-        loader = UnstructuredMarkdownLoader(md_path)
-        documents = loader.load()
+        if use_unstructured:
+            from langchain_community.document_loaders import UnstructuredMarkdownLoader
+
+            loader = UnstructuredMarkdownLoader(md_path)
+            # keep only the text: the loader's Document wrappers are released right away
+            texts = [document.page_content for document in loader.load()]
+        else:
+            # the splitter only needs the text: no partitioning pass, no unstructured import
+            texts = [Path(md_path).read_text(encoding="utf-8")]
         # Further split documents if needed
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            is_separator_regex=False,
-        )
+        splitter = _get_splitter(chunk_size, chunk_overlap)
 
-        pages = splitter.split_documents(documents)
-        page_content = [i.page_content for i in pages]
+        # split_text per text gives the same chunks as split_documents,
+        # without allocating a Document (and metadata copy) per chunk
+        page_content = [chunk for text in texts for chunk in splitter.split_text(text)]
+        del texts
         logger.info(f"📄 Markdown文件 '{file_name}' 被分解为 {len(page_content)} 个chunk")
         return page_content
 
@@ -335,12 +635,7 @@ def load_and_split_text(file_path: str, chunk_size: int, chunk_overlap: int, use
             return []
             
         # 使用LangChain的文本分割器进行切分
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            is_separator_regex=False,
-        )
+        splitter = _get_splitter(chunk_size, chunk_overlap)
         
         # 直接分割文本内容
         page_content = splitter.split_text(content)
@@ -362,6 +657,38 @@ def load_and_split_text(file_path: str, chunk_size: int, chunk_overlap: int, use
 
 
 # ------------llm generator-------------------
+# the fixed user turn of every default conversation, shared (never mutated) across calls
+_USER_INSTRUCTION = {"role": "user", "content": "请严格按照要求生成内容"}
+
+
+def _fenced_json(output: str) -> Optional[str]:
+    # body of the first ```json ... ``` block via plain index scans, None without one;
+    # a block closed right after the json is accepted, and so is a bare ``` fence, but
+    # blocks tagged with another language (```python ...) are skipped whole
+    start = output.find("```json")
+    if start != -1:
+        start = output.find("\n", start + 7)
+        if start == -1:
+            return None
+        end = output.find("```", start)
+        return None if end == -1 else output[start + 1:end]
+
+    pos = 0
+    while True:
+        start = output.find("```", pos)
+        if start == -1:
+            return None
+        newline = output.find("\n", start + 3)
+        if newline == -1:
+            return None
+        end = output.find("```", newline)
+        if end == -1:
+            return None
+        if not output[start + 3:newline].strip():
+            return output[newline + 1:end]
+        pos = end + 3
+
+
 def extract_json_from_llm_output(output: str):
     """
     Extract JSON content from LLM output, handling multiple possible formats
@@ -372,26 +699,26 @@ def extract_json_from_llm_output(output: str):
     Returns:
         Parsed JSON list if successful, None otherwise
     """
-    # Try to parse the entire output directly
-    try:
-        return json.loads(output)
-    except json.JSONDecodeError:
-        pass
-
-    # Try to extract content wrapped in ```json ```
-    json_match = re.search(r"```json\n([\s\S]*?)\n```", output)
-    if json_match:
+    # Try to extract content wrapped in ```json ``` first, the most common LLM output
+    fenced = _fenced_json(output)
+    if fenced is not None:
         try:
-            return json.loads(json_match.group(1))
+            return _json_loads(fenced)
         except json.JSONDecodeError as e:
             print(f"解析 JSON 时出错: {e}")
+    else:
+        # Try to parse the entire output directly (a fenced output never parses as a whole)
+        try:
+            return _json_loads(output)
+        except json.JSONDecodeError:
+            pass
 
     # Try to extract the most JSON-like part
     json_start = output.find("[")
     json_end = output.rfind("]") + 1
     if json_start != -1 and json_end != 0:
         try:
-            return json.loads(output[json_start:json_end])
+            return _json_loads(output[json_start:json_end])
         except json.JSONDecodeError:
             pass
 
@@ -399,6 +726,84 @@ def extract_json_from_llm_output(output: str):
     return None
 
 
+# opt-in exact-match cache of raw LLM outputs, keyed by the full request body and shared by
+# all worker threads; enable with set_llm_cache(path) or the DATAMAX_LLM_CACHE env variable
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def set_llm_cache(cache_path: Optional[str]) -> None:
+    """Use (or with None, stop using) a SQLite file as LLM response cache"""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is not None:
+            _llm_cache.close()
+            _llm_cache = None
+        if cache_path:
+            conn = sqlite3.connect(cache_path, check_same_thread=False, isolation_level=None)
+            conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, output TEXT NOT NULL)")
+            _llm_cache = conn
+
+
+def _llm_cache_key(data: dict) -> str:
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _llm_cache_get(key: str) -> Optional[str]:
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            return None
+        row = _llm_cache.execute("SELECT output FROM responses WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _llm_cache_put(key: str, output: str) -> None:
+    with _llm_cache_lock:
+        if _llm_cache is not None:
+            _llm_cache.execute(
+                "INSERT OR REPLACE INTO responses (key, output) VALUES (?, ?)", (key, output)
+            )
+
+
+set_llm_cache(os.getenv("DATAMAX_LLM_CACHE"))
+
+
+# a streamed reply longer than this is treated as runaway generation and dropped
+_STREAM_MAX_CHARS = 100_000
+
+
+def _read_stream(response, stop_at_json: bool) -> Optional[str]:
+    """
+    Accumulate the content deltas of a streamed (SSE) chat completion.
+    With stop_at_json, reading stops as soon as a fenced json block is closed and the
+    connection is dropped, so trailing chatter is neither waited for nor generated.
+    """
+    parts = []
+    size = 0
+    try:
+        for raw in response.iter_lines():
+            if not raw.startswith(b"data:"):
+                continue
+            payload = raw[5:].strip()
+            if payload == b"[DONE]":
+                break
+            choices = _json_loads(payload).get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            size += len(delta)
+            if size > _STREAM_MAX_CHARS:
+                logger.warning(f"流式输出超过 {_STREAM_MAX_CHARS} 字符，已中止")
+                return None
+            if stop_at_json and "```" in delta and _fenced_json("".join(parts)) is not None:
+                break
+    finally:
+        response.close()
+    return "".join(parts)
+
+
 def llm_generator(
     api_key: str,
     model: str,
@@ -408,14 +813,16 @@ def llm_generator(
     message: list = None,
     temperature: float = 0.7,
     top_p: float = 0.9,
-) -> list:
-    """Generate content using LLM API"""
+    stream: bool = False,
+) -> Optional[list]:
+    """
+    Generate content using LLM API, optionally reading the reply as a stream.
+    Returns [] for an empty or unusable reply and None when the request itself failed
+    after _post_llm's retries, so callers do not retry it again.
+    """
     try:
         if not message:
-            message = [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": "请严格按照要求生成内容"},
-            ]
+            message = [{"role": "system", "content": prompt}, _USER_INSTRUCTION]
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
@@ -427,20 +834,39 @@ def llm_generator(
             "top_p": top_p,
         }
 
-        response = requests.post(base_url, headers=headers, json=data, timeout=120)
-        response.raise_for_status()
-        result = response.json()
+        cache_key = _llm_cache_key(data) if _llm_cache is not None else None
+        output = _llm_cache_get(cache_key) if cache_key else None
+        cached = output is not None
+        if stream and not cached:
+            response = _post_llm(base_url, headers, {**data, "stream": True}, stream=True)
+            output = _read_stream(response, stop_at_json=(type == "question"))
+            if output is None:
+                return []
+        elif not cached:
+            response = _post_llm(base_url, headers, data)
+            result = response.json()
 
-        # Parse LLM response
-        if "choices" in result and len(result["choices"]) > 0:
+            # Parse LLM response
+            if not ("choices" in result and len(result["choices"]) > 0):
+                return []
             output = result["choices"][0]["message"]["content"]
-            if type == "question":
-                fmt_output = extract_json_from_llm_output(output)
-                return fmt_output if fmt_output is not None else []
-            else:
-                return [output] if output else []
-        return []
 
+        if type == "question":
+            fmt_output = extract_json_from_llm_output(output)
+            if fmt_output is None:
+                return []
+        else:
+            if not output:
+                return []
+            fmt_output = [output]
+        # only usable outputs are stored, so retries after a malformed reply still reach the LLM
+        if cache_key and not cached:
+            _llm_cache_put(cache_key, output)
+        return fmt_output
+
+    except requests.RequestException as e:
+        logger.error(f"LLM请求失败，已重试 {_LLM_MAX_ATTEMPTS} 次: {e}")
+        return None
     except Exception as e:
         logger.error(f"LLM提取关键词失败: {e}")
         if hasattr(e, "__traceback__") and e.__traceback__ is not None:
@@ -448,7 +874,108 @@ def llm_generator(
         return []
 
 
+# ------------batch api-------------
+_BATCH_DONE_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+# the provider expires a batch after its 24h completion window; poll for one more hour at most
+_BATCH_MAX_WAIT = 25 * 3600
+
+
+def _batch_chat_completions(
+    api_key: str,
+    base_url: str,
+    model: str,
+    prompts: list,
+    temperature: float = 0.7,
+    top_p: float = 0.9,
+    poll_interval: int = 30,
+    max_wait: float = _BATCH_MAX_WAIT,
+) -> list:
+    """
+    Run one system prompt per request through the provider's OpenAI-compatible Batch API.
+    Batch jobs cost about half of live calls and finish within 24h, which suits offline
+    dataset building. Returns the output text per prompt, None where the request failed;
+    a job that cannot be submitted, errors while polling or outlives max_wait seconds
+    yields all None so callers fall back to live calls.
+    """
+    from openai import OpenAI
+
+    api_base = base_url.rstrip("/")
+    if api_base.endswith("/chat/completions"):
+        api_base = api_base[: -len("/chat/completions")]
+    client = OpenAI(api_key=api_key, base_url=api_base)
+
+    lines = [
+        json.dumps(
+            {
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": [{"role": "system", "content": prompt}, _USER_INSTRUCTION],
+                    "temperature": temperature,
+                    "top_p": top_p,
+                },
+            },
+            ensure_ascii=False,
+        )
+        for i, prompt in enumerate(prompts)
+    ]
+    outputs = [None] * len(prompts)
+    try:
+        input_file = client.files.create(
+            file=("tasks.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info(f"已提交批处理任务 {batch.id}，共 {len(prompts)} 个请求，等待完成...")
+        deadline = time.monotonic() + max_wait
+        while batch.status not in _BATCH_DONE_STATUSES:
+            if time.monotonic() >= deadline:
+                logger.error(f"批处理任务 {batch.id} 超过 {max_wait} 秒仍未完成，取消任务")
+                try:
+                    client.batches.cancel(batch.id)
+                except Exception as e:
+                    logger.warning(f"取消批处理任务 {batch.id} 失败: {e}")
+                return outputs
+            time.sleep(poll_interval)
+            batch = client.batches.retrieve(batch.id)
+
+        if batch.status != "completed" or not batch.output_file_id:
+            logger.error(f"批处理任务 {batch.id} 未完成: {batch.status}")
+            return outputs
+        result_text = client.files.content(batch.output_file_id).text
+    except Exception as e:
+        logger.error(f"批处理任务失败: {e}")
+        return [None] * len(prompts)
+
+    for line in result_text.splitlines():
+        if not line.strip():
+            continue
+        record = _json_loads(line)
+        response = record.get("response") or {}
+        choices = (response.get("body") or {}).get("choices") or []
+        if response.get("status_code") == 200 and choices:
+            outputs[int(record["custom_id"])] = choices[0]["message"]["content"]
+    logger.info(f"批处理任务 {batch.id} 完成，成功 {sum(o is not None for o in outputs)}/{len(prompts)}")
+    return outputs
+
+
 # ------------thread_process-------------
+def _batch_index(value, size: int) -> Optional[int]:
+    """The id of a label reply as an index into its batch, None if missing or out of range"""
+    if isinstance(value, bool):
+        return None
+    try:
+        index = int(value)
+    except (TypeError, ValueError):
+        return None
+    return index if 0 <= index < size else None
+
+
 def process_match_tags(
     api_key: str,
     model: str,
@@ -457,34 +984,62 @@ def process_match_tags(
     tags_json: list,
     temperature: float = 0.7,
     top_p: float = 0.9,
-    max_workers: int = 3
+    max_workers: int = 3,
+    batch_size: int = 32,
 ):
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    logger.info(f"开始并发生成问题匹配标签... (max_workers={max_workers})")
-    results = []
-    def match_one_question(q):
-        prompt = get_system_prompt_for_match_label(tags_json, [q])
+    logger.info(f"开始并发生成问题匹配标签... (max_workers={max_workers}, batch_size={batch_size})")
+    batches = [questions[i:i + batch_size] for i in range(0, len(questions), batch_size)]
+    # built once: all batches share this system message, only the user turn differs
+    system_prompt = get_static_label_system_prompt(tags_json)
+
+    def match_batch(qs):
+        # the prompt takes a question array: one request labels the whole batch
+        message = [
+            {"role": "system", "content": system_prompt},
+            {
+                "role": "user",
+                "content": _to_prompt_json([{"id": i, "question": q} for i, q in enumerate(qs)]),
+            },
+        ]
         match = llm_generator(
             api_key=api_key,
             model=model,
             base_url=base_url,
-            prompt=prompt,
+            prompt=system_prompt,
+            message=message,
             type="question",
         )
-        # llm_generator return a list, only one question is passed, take the first one
-        return match[0] if match else {"question": q, "label": "其他"}
+        if not match and len(qs) > 1:
+            # unparseable batch reply: label the questions one by one rather than all as "其他"
+            logger.warning(f"批量标签匹配失败，改为逐题匹配 ({len(qs)} 个问题)")
+            return [res for q in qs for res in match_batch([q])]
+        # map replies back by batch index, not by the (possibly reworded) question text
+        labels = {}
+        for item in match or []:
+            if not isinstance(item, dict):
+                continue
+            index = _batch_index(item.get("id"), len(qs))
+            if index is None and len(qs) == 1 and len(match) == 1:
+                index = 0  # a lone reply without id can only belong to the lone question
+            if index is not None:
+                labels.setdefault(index, item.get("label") or "其他")
+        missing = [i for i in range(len(qs)) if i not in labels]
+        if missing and len(qs) > 1:
+            logger.warning(f"批量标签匹配遗漏 {len(missing)} 个问题，改为逐题匹配")
+            for i in missing:
+                labels[i] = match_batch([qs[i]])[0]["label"]
+        elif missing:
+            logger.warning(f"问题未匹配到标签，标记为\"其他\": {qs[0]}")
+        return [{"question": q, "label": labels.get(i, "其他")} for i, q in enumerate(qs)]
 
+    results = []
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_q = {executor.submit(match_one_question, q): q for q in questions}
-        for future in as_completed(future_to_q):
-            res = future.result()
-            #print(f"问题: {res.get('question', '')} | 匹配标签: {res.get('label', '')}")
-            results.append(res)
+        for res in executor.map(match_batch, batches):
+            results.extend(res)
     logger.success(f"问题匹配标签生成成功, 共生成 {len(results)} 个问题")
     return results
 
 
-
 def process_domain_tree(
     api_key: str,
     model: str,
@@ -496,25 +1051,21 @@ def process_domain_tree(
 ) -> DomainTree:
     prompt = get_system_prompt_for_domain_tree(text)
     logger.info(f"领域树生成开始...")
-    
+    # the request is identical on every attempt: build it once
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    data = {
+        "model": model,
+        "messages": [{"role": "system", "content": prompt}, _USER_INSTRUCTION],
+        "temperature": temperature,
+        "top_p": top_p,
+    }
+
     for attempt in range(max_retries):
         try:
-            message = [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": "请严格按照要求生成内容"},
-            ]
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-            data = {
-                "model": model,
-                "messages": message,
-                "temperature": temperature,
-                "top_p": top_p,
-            }
-            response = requests.post(base_url, headers=headers, json=data)
-            response.raise_for_status()
+            response = _post_llm(base_url, headers, data)
             result = response.json()
             
             # Parse LLM response
@@ -533,7 +1084,11 @@ def process_domain_tree(
                     logger.warning(f"领域树生成失败 (尝试 {attempt + 1}/{max_retries}): 空输出")
             else:
                 logger.warning(f"领域树生成失败 (尝试 {attempt + 1}/{max_retries}): 无效响应格式")
-                
+
+        except requests.RequestException as e:
+            # _post_llm already retried the request with backoff
+            logger.error(f"领域树请求失败，已重试 {_LLM_MAX_ATTEMPTS} 次: {e}")
+            break
         except Exception as e:
             logger.error(f"领域树生成异常 (尝试 {attempt + 1}/{max_retries}): {e}")
             if hasattr(e, "__traceback__") and e.__traceback__ is not None:
@@ -555,6 +1110,109 @@ def process_domain_tree(
     return None
 
 
+def _split_sections(text: str, section_chars: int) -> list:
+    """Split text into sections of at most ~section_chars, cutting on line boundaries"""
+    sections, current, size = [], [], 0
+    for line in text.splitlines(keepends=True):
+        if current and size + len(line) > section_chars:
+            sections.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        sections.append("".join(current))
+    return sections
+
+
+# per-section numbering such as "1 ", "1.2 " or "3. " in front of a generated label
+_LABEL_NUMBER_RE = re.compile(r"^\s*\d+(?:\.\d+)*(?:[.、]\s*|\s+)")
+
+
+def _merge_domain_trees(partial_trees: list) -> list:
+    """
+    Merge per-section trees into one two-level tree (JSON form).
+    Every section numbers its labels from 1, so numbers are stripped before comparing,
+    names are deduplicated only among siblings at the same depth, and the result is renumbered.
+    """
+    merged = {}  # first-level name -> {second-level name: None}, both in first-seen order
+    for partial in partial_trees:
+        if partial is None:
+            continue
+        for node in partial.to_json():
+            if not isinstance(node, dict):
+                continue
+            name = _LABEL_NUMBER_RE.sub("", node.get("label") or "").strip()
+            if not name:
+                continue
+            children = merged.setdefault(name, {})
+            for child in node.get("child") or []:
+                if not isinstance(child, dict):
+                    continue
+                child_name = _LABEL_NUMBER_RE.sub("", child.get("label") or "").strip()
+                if child_name:
+                    children.setdefault(child_name, None)
+
+    tree = []
+    for i, (name, children) in enumerate(merged.items(), 1):
+        node = {"label": f"{i} {name}"}
+        if children:
+            node["child"] = [{"label": f"{i}.{j} {c}"} for j, c in enumerate(children, 1)]
+        tree.append(node)
+    return tree
+
+
+def process_domain_tree_parallel(
+    api_key: str,
+    model: str,
+    base_url: str,
+    text: str,
+    temperature: float = 0.7,
+    top_p: float = 0.9,
+    max_retries: int = 3,
+    max_workers: int = 4,
+    section_chars: int = 8000,
+) -> DomainTree:
+    """
+    Build the domain tree for long texts: generate a partial tree per section
+    concurrently and merge them. Texts up to section_chars take the single-request path.
+    Opt-in (parallel_domain_tree in full_qa_labeling_process): the merged tree may differ
+    from the one a single request over the whole text would give.
+    """
+    if len(text) <= section_chars:
+        return process_domain_tree(
+            api_key=api_key,
+            model=model,
+            base_url=base_url,
+            text=text,
+            temperature=temperature,
+            top_p=top_p,
+            max_retries=max_retries,
+        )
+
+    sections = _split_sections(text, section_chars)
+    logger.info(f"文本过长，拆分为 {len(sections)} 段并发生成领域树 (线程数: {max_workers})")
+
+    def _partial_tree(section):
+        return process_domain_tree(
+            api_key=api_key,
+            model=model,
+            base_url=base_url,
+            text=section,
+            temperature=temperature,
+            top_p=top_p,
+            max_retries=max_retries,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partial_trees = list(executor.map(_partial_tree, sections))
+
+    merged = _merge_domain_trees(partial_trees)
+    if not merged:
+        return None
+    logger.info(f"领域树合并完成, 共 {len(merged)} 个大标签")
+    return DomainTree(merged)
+
+
 def process_questions(
     api_key: str,
     model: str,
@@ -564,17 +1222,20 @@ def process_questions(
     max_workers: int = 5,
     message: list = None,
     max_retries: int = 3,
+    use_batch_api: bool = False,
 ) -> list:
-    """Generate questions using multi-threading with retry mechanism"""
+    """
+    Generate questions using multi-threading with retry mechanism.
+    With use_batch_api set, the pages are first sent as one Batch API job; pages it
+    fails on go through the live calls below.
+    """
     total_questions = []
-    if message is None:
-        message = []
     
     def _generate_questions_with_retry(page):
         """Inner function for question generation with retry"""
+        prompt = get_system_prompt_for_question(page, question_number)
         for attempt in range(max_retries):
             try:
-                prompt = get_system_prompt_for_question(page, question_number)
                 questions = llm_generator(
                     api_key=api_key,
                     model=model,
@@ -583,6 +1244,8 @@ def process_questions(
                     prompt=prompt,
                     type="question",
                 )
+                if questions is None:
+                    return []  # request failed, already retried by _post_llm
                 if questions:
                     return [{"question": question, "page": page} for question in questions]
                 else:
@@ -600,19 +1263,122 @@ def process_questions(
         logger.error(f"问题生成失败，已重试 {max_retries} 次")
         return []
 
+    # identical chunks (repeated boilerplate, headers) would only yield the same
+    # {"question", "page"} records again: ask the LLM once per distinct chunk
+    unique_pages = list(dict.fromkeys(page_content))
+    if len(unique_pages) < len(page_content):
+        logger.info(f"跳过 {len(page_content) - len(unique_pages)} 个重复文本块")
+
+    # a custom message replaces the system prompt, so it can only be sent live
+    if use_batch_api and not message and unique_pages:
+        outputs = _batch_chat_completions(
+            api_key,
+            base_url,
+            model,
+            [get_system_prompt_for_question(page, question_number) for page in unique_pages],
+        )
+        failed_pages = []
+        for page, output in zip(unique_pages, outputs):
+            questions = extract_json_from_llm_output(output) if output else None
+            if questions:
+                total_questions.extend({"question": question, "page": page} for question in questions)
+            else:
+                failed_pages.append(page)
+        unique_pages = failed_pages
+
     logger.info(f"开始生成问题 (线程数: {max_workers}, 重试次数: {max_retries})...")
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(_generate_questions_with_retry, page) for page in page_content]
+        futures = [executor.submit(_generate_questions_with_retry, page) for page in unique_pages]
         with tqdm(as_completed(futures), total=len(futures), desc="生成问题") as pbar:
             for future in pbar:
                 result = future.result()
                 if result:
-                    with lock:
-                        total_questions.extend(result)
+                    # as_completed yields on this thread only, workers never touch the list
+                    total_questions.extend(result)
                     pbar.set_postfix({"已生成问题": len(total_questions)})
     return total_questions
 
 
+def process_qa_pairs_in_one_shot(
+    api_key: str,
+    model: str,
+    base_url: str,
+    page_content: list,
+    question_number: int,
+    max_workers: int = 5,
+    max_retries: int = 3,
+) -> list:
+    """
+    Generate questions and their answers in one call per chunk, so each chunk is sent once
+    instead of once for the questions plus once per answer.
+    Returns [{"question", "answer", "page"}, ...].
+    """
+    total_pairs = []
+
+    def _generate_pairs_with_retry(page):
+        prompt = get_system_prompt_for_qa_pairs(page, question_number)
+        for attempt in range(max_retries):
+            try:
+                pairs = llm_generator(
+                    api_key=api_key,
+                    model=model,
+                    base_url=base_url,
+                    prompt=prompt,
+                    type="question",
+                )
+                if pairs is None:
+                    return []  # request failed, already retried by _post_llm
+                pairs = [
+                    {"question": pair["question"], "answer": pair["answer"], "page": page}
+                    for pair in pairs
+                    if isinstance(pair, dict) and pair.get("question") and pair.get("answer")
+                ]
+                if pairs:
+                    return pairs
+                logger.warning(f"问答对生成失败 (尝试 {attempt + 1}/{max_retries}): 空结果")
+            except Exception as e:
+                logger.error(f"问答对生成异常 (尝试 {attempt + 1}/{max_retries}): {e}")
+
+            if attempt < max_retries - 1:
+                logger.info(f"等待重试... ({attempt + 2}/{max_retries})")
+                time.sleep(2)
+
+        logger.error(f"问答对生成失败，已重试 {max_retries} 次")
+        return []
+
+    unique_pages = list(dict.fromkeys(page_content))
+    logger.info(f"开始一次性生成问答对 (线程数: {max_workers}, 重试次数: {max_retries})...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_generate_pairs_with_retry, page) for page in unique_pages]
+        with tqdm(as_completed(futures), total=len(futures), desc="生成问答对") as pbar:
+            for future in pbar:
+                result = future.result()
+                if result:
+                    total_pairs.extend(result)
+                    pbar.set_postfix({"已生成问答对": len(total_pairs)})
+    return total_pairs
+
+
+def _answer_cache_key(item: dict) -> str:
+    page_digest = hashlib.blake2b(item["page"].encode("utf-8"), digest_size=16).hexdigest()
+    return f"{page_digest}|{item['question']}"
+
+
+def _open_answer_cache(cache_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(cache_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL)")
+    return conn
+
+
+def _answers_by_question(batch_reply: list) -> dict:
+    # [{"question": ..., "answer": ...}, ...] -> {question: answer}, empty answers dropped
+    return {
+        res.get("question"): res.get("answer")
+        for res in batch_reply
+        if isinstance(res, dict) and res.get("answer")
+    }
+
+
 def process_answers(
     api_key: str,
     model: str,
@@ -621,16 +1387,42 @@ def process_answers(
     message: Optional[list] = None,
     max_workers=5,
     max_retries: int = 3,
+    cache_path: Optional[str] = None,
+    batch_by_page: bool = False,
+    use_batch_api: bool = False,
 ) -> dict:
-    """Generate answers using multi-threading"""
+    """
+    Generate answers using multi-threading.
+    With cache_path set, answers are persisted in a SQLite file keyed by
+    (page digest, question) and reused on later runs instead of calling the LLM again.
+    With batch_by_page set, the questions of one page are answered in a single call so
+    the page text is sent once; questions missing from the batch reply fall back to one
+    call per question.
+    With use_batch_api set, all requests are first sent as one Batch API job; questions
+    left unanswered by it go through the live calls.
+    """
     qa_pairs = {}
-    if message is None:
-        message = []
+    # the cache is only read and written on this thread: workers just call the LLM
+    cache = _open_answer_cache(cache_path) if cache_path else None
+    pending_items = question_items
+    if cache is not None:
+        pending_items = []
+        for item in question_items:
+            row = cache.execute(
+                "SELECT answer FROM answers WHERE key = ?", (_answer_cache_key(item),)
+            ).fetchone()
+            if row is None:
+                pending_items.append(item)
+            else:
+                qa_pairs[item["question"]] = row[0]
+        if qa_pairs:
+            logger.info(f"答案缓存命中 {len(qa_pairs)} 条，剩余 {len(pending_items)} 条需要生成")
+
     def _generate_answer_with_retry(item):
         """Inner function for answer generation with retry"""
+        prompt = get_system_prompt_for_answer(item["page"], item["question"])
         for attempt in range(max_retries):
             try:
-                prompt = get_system_prompt_for_answer(item["page"], item["question"])
                 answer = llm_generator(
                     api_key=api_key,
                     model=model,
@@ -639,6 +1431,8 @@ def process_answers(
                     message=message,
                     type="answer",
                 )
+                if answer is None:
+                    break  # request failed, already retried by _post_llm
                 if answer and len(answer) > 0:
                     return item["question"], answer[0]  # llm_generator returns a list
                 else:
@@ -658,30 +1452,103 @@ def process_answers(
         logger.error(f"网络状态不佳！舍弃了（{question_text}）问题的对应问答对")
         return None  # return None to discard the question with answer
 
-    logger.info(f"开始生成答案 (线程数: {max_workers}, 重试次数: {max_retries})...")
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {
-            executor.submit(_generate_answer_with_retry, item): item for item in question_items
-        }
+    def _generate_page_answers(items):
+        """Answer all questions of one page, returns a list of (item, answer)"""
+        answered = {}
+        # a custom message replaces the system prompt, so it can only be sent per question
+        if len(items) > 1 and not message:
+            prompt = get_system_prompt_for_answers_batch(
+                items[0]["page"], [item["question"] for item in items]
+            )
+            try:
+                batch = llm_generator(
+                    api_key=api_key,
+                    model=model,
+                    base_url=base_url,
+                    prompt=prompt,
+                    type="question",  # parse the reply as a json array
+                )
+                answered = _answers_by_question(batch or [])
+            except Exception as e:
+                logger.warning(f"批量答案生成失败，改为逐题生成: {e}")
+        results = []
+        for item in items:
+            answer = answered.get(item["question"])
+            if answer is None:
+                result = _generate_answer_with_retry(item)
+                if result is None:
+                    continue
+                answer = result[1]
+            results.append((item, answer))
+        return results
+
+    # keyed by page in first-seen order, each task carries the questions of one page
+    if batch_by_page:
+        by_page = {}
+        for item in pending_items:
+            by_page.setdefault(item["page"], []).append(item)
+        tasks = list(by_page.values())
+    else:
+        tasks = [[item] for item in pending_items]
+
+    def _record(item, answer):
+        qa_pairs[item["question"]] = answer
+        if cache is not None:
+            cache.execute(
+                "INSERT OR REPLACE INTO answers (key, answer) VALUES (?, ?)",
+                (_answer_cache_key(item), answer),
+            )
 
-        with tqdm(as_completed(futures), total=len(futures), desc="生成答案") as pbar:
-            for future in pbar:
-                result = future.result()
-                if result is not None:  # only add question with answer
-                    question, answer = result
-                    with lock:
-                        qa_pairs[question] = answer
+    try:
+        # a custom message replaces the system prompt, so it can only be sent live
+        if use_batch_api and not message and tasks:
+            prompts = [
+                get_system_prompt_for_answers_batch(items[0]["page"], [item["question"] for item in items])
+                if len(items) > 1
+                else get_system_prompt_for_answer(items[0]["page"], items[0]["question"])
+                for items in tasks
+            ]
+            outputs = _batch_chat_completions(api_key, base_url, model, prompts)
+            remaining_tasks = []
+            for items, output in zip(tasks, outputs):
+                if output and len(items) > 1:
+                    answered = _answers_by_question(extract_json_from_llm_output(output) or [])
+                else:
+                    answered = {items[0]["question"]: output} if output else {}
+                left = []
+                for item in items:
+                    if answered.get(item["question"]):
+                        _record(item, answered[item["question"]])
+                    else:
+                        left.append(item)
+                if left:
+                    remaining_tasks.append(left)
+            tasks = remaining_tasks
+
+        logger.info(
+            f"开始生成答案 (线程数: {max_workers}, 重试次数: {max_retries}, 请求数: {len(tasks)})..."
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_generate_page_answers, items): items for items in tasks}
+
+            with tqdm(total=sum(len(items) for items in tasks), desc="生成答案") as pbar:
+                for future in as_completed(futures):
+                    for item, answer in future.result():  # only add question with answer
+                        _record(item, answer)
+                    pbar.update(len(futures[future]))
                     pbar.set_postfix({"已生成答案": len(qa_pairs)})
+    finally:
+        if cache is not None:
+            cache.commit()
+            cache.close()
     return qa_pairs
 
 
 # find tagpath by label
-
 def find_tagpath_by_label(domain_tree: DomainTree, label: str):
     return domain_tree.find_path(label)
 
 
-
 def generatr_qa_pairs(
     question_info: list,
     api_key: str,
@@ -691,6 +1558,9 @@ def generatr_qa_pairs(
     message: list = None,
     max_workers: int = 5,
     domain_tree: DomainTree = None,  
+    answer_cache_path: Optional[str] = None,
+    use_batch_api: bool = False,
+    batch_answers_by_page: bool = False,
 ) -> list:
     if message is None:
         message = []
@@ -704,18 +1574,27 @@ def generatr_qa_pairs(
         api_key=api_key,
         base_url=base_url,
         model=model_name,
+        cache_path=answer_cache_path,
+        batch_by_page=batch_answers_by_page,
+        use_batch_api=use_batch_api,
     )
     logger.success(
         f"完成! 共生成 {len(qa_pairs)} 个问答对"
     )
+    return _build_qa_entries(question_info, qa_pairs, domain_tree)
+
+
+def _build_qa_entries(question_info: list, qa_pairs: dict, domain_tree: Optional[DomainTree]) -> list:
     res_list = []
+    # label -> tag path resolved once for the whole batch
+    path_map = domain_tree.label_paths() if domain_tree else {}
     for question_item in question_info:
         question = question_item["question"]
         # only add question with answer
         if question in qa_pairs:
             label = question_item.get("label", "")
             answer = qa_pairs[question]
-            tag_path = find_tagpath_by_label(domain_tree, label) if domain_tree else ""
+            tag_path = path_map.get(label) if domain_tree else ""
             qid = question_item.get("qid", "")
             method = "text with tree label" if domain_tree else "text"
             qa_entry = {
@@ -731,6 +1610,16 @@ def generatr_qa_pairs(
     return res_list
 
 
+_TREE_OPERATIONS_HELP = """支持的操作:
+1. 增加节点：xxx；父节点：xxx   （父节点可留空，留空则添加为根节点）
+2. 增加节点：xxx；父节点：xxx；子节点：xxx
+3. 删除节点：xxx
+4. 更新节点：新名称；原先节点：旧名称
+5. 结束树操作
+6. 帮助（重新显示本说明）
+注意，节点的格式通常为：x.xx xxxx,如：‘1.1 货物运输组织与路径规划’或‘1 运输系统组织’"""
+
+
 def _interactive_tree_modification(domain_tree):
     """
     交互式自定义领域树结构
@@ -738,17 +1627,15 @@ def _interactive_tree_modification(domain_tree):
     :return: 修改后的DomainTree实例
     """
     print("\n 是否需要进行树修改？")
-    print("支持的操作:")
-    print("1. 增加节点：xxx；父节点：xxx   （父节点可留空，留空则添加为根节点）")
-    print("2. 增加节点：xxx；父节点：xxx；子节点：xxx")
-    print("3. 删除节点：xxx")
-    print("4. 更新节点：新名称；原先节点：旧名称")
-    print("5. 结束树操作")
-    print("注意，节点的格式通常为：x.xx xxxx,如：‘1.1 货物运输组织与路径规划’或‘1 运输系统组织’")
+    # 操作说明只在开始时和输入"帮助"时显示，不在每次操作后重复输出
+    print(_TREE_OPERATIONS_HELP)
     print("\n请输入操作指令（输入'结束树操作'退出）:")
     while True:
         try:
             user_input = input("> ").strip()
+            if user_input in ("帮助", "help"):
+                print(_TREE_OPERATIONS_HELP)
+                continue
             if user_input == "结束树操作":
                 print("✅ 树操作结束，继续QA对生成...")
                 break
@@ -796,16 +1683,8 @@ def _interactive_tree_modification(domain_tree):
                     print("❌ 格式错误：请使用正确的格式，如：更新节点：新名称；原先节点：旧名称")
             else:
                 print("❌ 未知操作，请使用正确的格式")
-            print("\n📝 当前树结构:")
-            print(domain_tree.visualize())
-            print("\n请输入下一个操作指令:")
-            print("支持的操作:")
-            print("1. 增加节点：xxx；父节点：xxx   （父节点可留空，留空则添加为根节点）")
-            print("2. 增加节点：xxx；父节点：xxx；子节点：xxx")
-            print("3. 删除节点：xxx")
-            print("4. 更新节点：新名称；原先节点：旧名称")
-            print("5. 结束树操作")
-            print("注意，节点的格式通常为：x.xx xxxx,如：‘1.1 货物运输组织与路径规划’或‘1 运输系统组织’")
+            print(f"\n📝 当前树结构:\n{domain_tree.visualize()}")
+            print("\n请输入下一个操作指令（输入'帮助'查看支持的操作）:")
         except KeyboardInterrupt:
             print("\n\n⚠️⚠️操作被中断⚠️⚠️，继续QA对生成...")
             break
@@ -830,12 +1709,23 @@ def full_qa_labeling_process(
     interactive_tree: bool = True,
     custom_domain_tree: list = None,
     use_mineru: bool = False,  # 添加use_mineru参数
+    answer_cache_path: str = None,
+    use_batch_api: bool = False,
+    one_shot_qa: bool = False,
+    parallel_domain_tree: bool = False,
+    batch_answers_by_page: bool = False,
 ):
     """
     封装完整的QA生成流程，包括分割、领域树生成与交互、问题生成、标签打标、答案生成。
+    use_batch_api=True 时问题与答案生成通过Batch API离线提交（费用约减半，最长等待24小时）。
+    one_shot_qa=True 时每个文本块只调用一次大模型，同时生成问题与答案；
+    该模式不支持 messages、use_batch_api 与 answer_cache_path，同时传入会抛出 ValueError。
+    parallel_domain_tree=True 时长文本分段并发生成领域树后合并（默认单次请求生成）。
+    batch_answers_by_page=True 时同一文本块的问题在一次调用中批量生成答案（默认逐题生成）。
     """
     from datamax.utils.qa_generator import (
         process_domain_tree,
+        process_domain_tree_parallel,
         process_questions,
         process_match_tags,
         generatr_qa_pairs,
@@ -845,6 +1735,20 @@ def full_qa_labeling_process(
     import uuid
     import os
 
+    if one_shot_qa:
+        # the one-shot prompt replaces both steps those options apply to
+        conflicts = [
+            name
+            for name, value in (
+                ("messages", messages),
+                ("use_batch_api", use_batch_api),
+                ("answer_cache_path", answer_cache_path),
+            )
+            if value
+        ]
+        if conflicts:
+            raise ValueError(f"one_shot_qa 不支持与 {', '.join(conflicts)} 同时使用")
+
     # 验证必需参数
     if not content:
         logger.error("必须提供content参数")
@@ -879,13 +1783,7 @@ def full_qa_labeling_process(
             logger.info("📄 使用PyMuPDF解析的PDF内容")
     
     # 直接使用LangChain的文本分割器进行切分，不创建临时文件
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-        is_separator_regex=False,
-    )
+    splitter = _get_splitter(chunk_size, chunk_overlap)
     page_content = splitter.split_text(content)
     
     # 添加内容分块完成的日志
@@ -909,14 +1807,25 @@ def full_qa_labeling_process(
             print("🌳 正在使用您上传的自定义领域树结构进行预标注...")
         else:
             # otherwise, generate tree from text
-            domain_tree = process_domain_tree(
-                api_key=api_key,
-                base_url=base_url,
-                model=model_name,
-                text="\n".join(page_content),
-                temperature=0.7,
-                top_p=0.9,
-            )
+            if parallel_domain_tree:
+                domain_tree = process_domain_tree_parallel(
+                    api_key=api_key,
+                    base_url=base_url,
+                    model=model_name,
+                    text="\n".join(page_content),
+                    temperature=0.7,
+                    top_p=0.9,
+                    max_workers=max_workers,
+                )
+            else:
+                domain_tree = process_domain_tree(
+                    api_key=api_key,
+                    base_url=base_url,
+                    model=model_name,
+                    text="\n".join(page_content),
+                    temperature=0.7,
+                    top_p=0.9,
+                )
             if domain_tree is None:
                 # tree generation failed, use text generation strategy
                 logger.info("领域树生成失败，采用纯文本生成策略")
@@ -934,18 +1843,32 @@ def full_qa_labeling_process(
                 print("💡 您可以对自定义树进行修改，或输入'结束树操作'直接使用")
             domain_tree = _interactive_tree_modification(domain_tree)
     #generate questions
-    question_info = process_questions(
-        api_key=api_key,
-        model=model_name,
-        base_url=base_url,
-        page_content=page_content,
-        question_number=question_number,
-        max_workers=max_workers,
-        message=messages,
-    )
-    for question_item in question_info:
+    if one_shot_qa:
+        # questions come with their answers: each chunk is sent to the LLM once
+        question_info = process_qa_pairs_in_one_shot(
+            api_key=api_key,
+            model=model_name,
+            base_url=base_url,
+            page_content=page_content,
+            question_number=question_number,
+            max_workers=max_workers,
+        )
+    else:
+        question_info = process_questions(
+            api_key=api_key,
+            model=model_name,
+            base_url=base_url,
+            page_content=page_content,
+            question_number=question_number,
+            max_workers=max_workers,
+            message=messages,
+            use_batch_api=use_batch_api,
+        )
+    # one random run id plus a counter: unique across runs, one urandom read per run
+    run_id = uuid.uuid4().hex
+    for i, question_item in enumerate(question_info):
         if "qid" not in question_item:
-            question_item["qid"] = str(uuid.uuid4())
+            question_item["qid"] = f"{run_id}-{i}"
     # 4.label tagging
     if use_tree_label and domain_tree and hasattr(domain_tree, 'to_json') and domain_tree.to_json():
         q_match_list = process_match_tags(
@@ -963,6 +1886,10 @@ def full_qa_labeling_process(
         for question_item in question_info:
             question_item["label"] = ""
     # 5.generate answers
+    if one_shot_qa:
+        qa_pairs = {item["question"]: item["answer"] for item in question_info}
+        logger.success(f"完成! 共生成 {len(qa_pairs)} 个问答对")
+        return _build_qa_entries(question_info, qa_pairs, domain_tree if use_tree_label else None)
     qa_list = generatr_qa_pairs(
         question_info=question_info,
         api_key=api_key,
@@ -970,7 +1897,10 @@ def full_qa_labeling_process(
         model_name=model_name,
         question_number=question_number,
         max_workers=max_workers,
-        domain_tree=domain_tree if use_tree_label else None
+        domain_tree=domain_tree if use_tree_label else None,
+        answer_cache_path=answer_cache_path,
+        use_batch_api=use_batch_api,
+        batch_answers_by_page=batch_answers_by_page,
     )
     return qa_list
 
@@ -1005,8 +1935,9 @@ if __name__ == "__main__":
     )
 
     # add unique id to each question
-    for question_item in question_info:
-        question_item["qid"] = str(uuid.uuid4())
+    run_id = uuid.uuid4().hex
+    for i, question_item in enumerate(question_info):
+        question_item["qid"] = f"{run_id}-{i}"
 
     if not question_info:
         logger.error("未能生成任何问题，请检查输入文档和API设置")
@@ -1029,9 +1960,6 @@ if __name__ == "__main__":
         label_map = {item["question"]: item.get("label", "") for item in q_match_list}
         for question_item in question_info:
             question_item["label"] = label_map.get(question_item["question"], "")
-        # get filtered question_info
-        question_list = [question_item["question"] for question_item in question_info]
-        question_info = [{"question": question_item["question"], "page": question_item["page"], "qid": question_item["qid"], "label": question_item["label"]} for question_item in question_info if question_item["question"] in question_list]
 
     # final answer
     r = generatr_qa_pairs(
@@ -1,10 +1,15 @@
+import atexit
 import os
+import select
 import subprocess
+import tempfile
 import threading
 import time
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
 
 from loguru import logger
 
@@ -27,6 +32,12 @@ def _lazy_import_uno():
         if _uno_imported:
             return True
 
+        # no spec on sys.path: fail fast without a second search by the import system
+        if not check_uno_available():
+            _import_error = ImportError("No module named 'uno'")
+            logger.error(f"❌ UNO模块导入失败: {str(_import_error)}")
+            return False
+
         try:
             # import module relate to UNO
             global uno, PropertyValue, NoConnectException
@@ -55,8 +66,9 @@ def ensure_uno_imported():
 
 
 # check if uno is available(not importing immediately）
+@lru_cache(maxsize=1)
 def check_uno_available():
-    """检查 UNO 是否可用（不会真正导入）"""
+    """检查 UNO 是否可用（不会真正导入），结果在进程内缓存，sys.path 只扫描一次"""
     try:
         import importlib.util
 
@@ -68,6 +80,60 @@ def check_uno_available():
 
 HAS_UNO = check_uno_available()
 
+# upper bound for one liveness probe: a blackholed host fails fast instead of
+# waiting out the OS SYN retransmits (localhost answers or refuses immediately)
+PROBE_TIMEOUT = 0.25
+
+# default export filter per output format (read-only: per-manager property caches depend on it)
+FILTER_MAP = MappingProxyType(
+    {
+        "pdf": "writer_pdf_Export",
+        "docx": "MS Word 2007 XML",
+        "pptx": "Impress MS PowerPoint 2007 XML",
+        "xlsx": "Calc MS Excel 2007 XML",
+    }
+)
+
+
+@lru_cache(maxsize=4096)
+def _file_url_of(abs_path: str) -> str:
+    # systemPathToFileUrl crosses the Python-UNO bridge: memoized per absolute path
+    return uno.systemPathToFileUrl(abs_path)
+
+
+def _to_file_url(path: str) -> str:
+    # abspath stays outside the cache: it depends on the current working directory
+    return _file_url_of(os.path.abspath(path))
+
+
+def _wait_process(proc: subprocess.Popen, timeout: float) -> bool:
+    """
+    等待子进程退出，返回是否在超时前退出
+    Linux >= 5.3 上用 pidfd + select 由内核在进程退出时唤醒，其它平台回退到 Popen.wait 轮询
+    """
+    if proc.poll() is not None:
+        return True
+    pidfd_open = getattr(os, "pidfd_open", None)
+    if pidfd_open is not None:
+        try:
+            fd = pidfd_open(proc.pid)
+        except OSError:
+            pass  # kernel without pidfd support
+        else:
+            try:
+                ready, _, _ = select.select([fd], [], [], timeout)
+            finally:
+                os.close(fd)
+            if not ready:
+                return False
+            proc.wait()  # already exited: only reaps the zombie
+            return True
+    try:
+        proc.wait(timeout=timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        return False
+
 
 class UnoManager:
     """
@@ -95,9 +161,22 @@ class UnoManager:
         )
         self._lock = threading.Lock()
         self._desktop = None
+        self._load_from_url = None  # desktop.loadComponentFromURL, bound once per connection
         self._ctx = None
         self._soffice_process = None
         self._connected = False
+        # sticky after the first successful probe, cleared when the service goes away
+        self._service_up = False
+        self._last_ping = 0.0
+        # PropertyValue structs are marshalled by value, so the same sequences are reused per call
+        self._load_props = (
+            self._make_property("Hidden", True),
+            self._make_property("ReadOnly", True),
+            # MacroExecMode.NEVER_EXECUTE / UpdateDocMode.NO_UPDATE: no macros, no link refresh
+            self._make_property("MacroExecutionMode", 0),
+            self._make_property("UpdateDocMode", 0),
+        )
+        self._filter_props: Dict[Tuple[str, Optional[str]], tuple] = {}
         logger.info(f"🚀 UnoManager初始化 - 主机: {host}, 端口: {port} (单线程模式)")
 
     def _start_soffice_service(self):
@@ -109,9 +188,16 @@ class UnoManager:
             logger.info("✅ LibreOffice服务已在运行")
             return
 
+        # own profile per port: the default profile is locked by a desktop LibreOffice or a
+        # concurrent `soffice --convert-to`, which stalls startup or hands the request over to
+        # that instance; kept across restarts since creating a profile takes seconds
+        profile_dir = Path(tempfile.gettempdir()) / f"datamax_lo_profile_{self.port}"
+        profile_dir.mkdir(exist_ok=True)
+
         # new a soffice
         cmd = [
             "soffice",
+            f"-env:UserInstallation={profile_dir.as_uri()}",
             "--headless",
             "--invisible",
             "--nocrashreport",
@@ -128,24 +214,29 @@ class UnoManager:
             )
             logger.info(f"⏳ 等待LibreOffice服务启动...")
 
-            # Intelligent waiting: Polling to check service status, providing flexible time for machines of different performance levels.
-            start_time = time.time()
-            check_interval = 1  # checking every sec
-            max_wait_time = 30  # wait for max 30 sec
+            # Intelligent waiting: short polling returns as soon as the accept socket listens,
+            # instead of rounding every startup up to the next full second.
+            # The interval backs off (1ms, 2ms, 4ms ... 100ms) to keep probe syscalls low.
+            start_time = time.monotonic()
+            deadline = start_time + self.timeout
+            check_interval = 0.001
 
-            while time.time() - start_time < max_wait_time:
+            while time.monotonic() < deadline:
                 if self._check_soffice_running():
-                    elapsed = time.time() - start_time
-                    logger.info(f"✅ LibreOffice服务启动成功 (耗时 {elapsed:.1f}秒)")
+                    elapsed = time.monotonic() - start_time
+                    logger.info(f"✅ LibreOffice服务启动成功 (耗时 {elapsed:.2f}秒)")
                     return
 
-                logger.debug(
-                    f"🔄 服务未就绪，继续等待... (已等待 {time.time() - start_time:.1f}秒)"
-                )
+                # soffice exited (bad install, port taken...): no point waiting for the timeout
+                if self._soffice_process.poll() is not None:
+                    raise Exception(
+                        f"LibreOffice进程已退出 (返回码 {self._soffice_process.returncode})"
+                    )
                 time.sleep(check_interval)
+                check_interval = min(check_interval * 2, 0.1)
 
             # overtime
-            raise Exception(f"LibreOffice服务启动超时 (等待了{max_wait_time}秒)")
+            raise Exception(f"LibreOffice服务启动超时 (等待了{self.timeout}秒)")
 
         except Exception as e:
             logger.error(f"❌ 启动LibreOffice服务失败: {str(e)}")
@@ -153,13 +244,20 @@ class UnoManager:
 
     def _check_soffice_running(self) -> bool:
         """检查LibreOffice服务是否在运行"""
+        if self._service_up:
+            return True
         try:
             import socket
 
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            result = sock.connect_ex((self.host, self.port))
-            sock.close()
-            return result == 0
+            # with a timeout the connect is non-blocking plus a bounded wait for writability
+            sock.settimeout(PROBE_TIMEOUT)
+            try:
+                result = sock.connect_ex((self.host, self.port))
+            finally:
+                sock.close()
+            self._service_up = result == 0
+            return self._service_up
         except:
             return False
 
@@ -170,9 +268,13 @@ class UnoManager:
 
     def connect(self):
         """连接到LibreOffice服务"""
+        # fast path without the lock: _desktop is published only after the connection is up,
+        # and attribute reads/writes are atomic, so a non-None value is always usable
+        if self._connected and self._desktop is not None:
+            return  # connected
         with self._lock:
             if self._connected and self._desktop is not None:
-                return  # connected
+                return  # connected by another thread meanwhile
 
             self._start_soffice_service()
 
@@ -189,47 +291,82 @@ class UnoManager:
 
                     # connect to LibreOffice
                     self._ctx = resolver.resolve(f"uno:{self.connection_string}")
-                    self._desktop = self._ctx.ServiceManager.createInstanceWithContext(
+                    desktop = self._ctx.ServiceManager.createInstanceWithContext(
                         "com.sun.star.frame.Desktop", self._ctx
                     )
+                    # bind the hot method before publishing: no pyuno attribute lookup per document
+                    self._load_from_url = desktop.loadComponentFromURL
+                    self._desktop = desktop  # publish only the fully created desktop
 
                     self._connected = True
                     logger.info("✅ 成功连接到LibreOffice服务")
                     return
 
                 except NoConnectException:
+                    # the port already answers, only the UNO bridge handshake can still race
                     logger.debug("⏳ 等待LibreOffice服务就绪...")
-                    time.sleep(1)
+                    self._service_up = False  # re-probe on the next start
+                    time.sleep(0.1)
                 except Exception as e:
                     logger.error(f"❌ 连接失败: {str(e)}")
+                    self._service_up = False  # re-probe on the next start
                     time.sleep(1)
 
             raise TimeoutError(f"连接LibreOffice服务超时（{self.timeout}秒）")
 
-    def disconnect(self):
-        """断开与LibreOffice服务的连接"""
+    def _ensure_alive(self, ping_interval: float = 5.0):
+        """连接并确认UNO桥仍然可用（最多每 ping_interval 秒探测一次），失效时重新连接"""
+        self.connect()
+        now = time.monotonic()
+        if now - self._last_ping < ping_interval:
+            return
+        try:
+            self._desktop.getFrames().getCount()  # cheap round-trip over the bridge
+        except Exception as e:
+            logger.warning(f"⚠️ LibreOffice连接已失效，重新连接: {str(e)}")
+            with self._lock:
+                self._desktop = None
+                self._ctx = None
+                self._connected = False
+                self._service_up = False
+            self.connect()
+        self._last_ping = time.monotonic()
+
+    def disconnect(self, terminate: bool = True):
+        """断开与LibreOffice服务的连接
+
+        :param terminate: 同时通过 desktop.terminate() 关闭LibreOffice
+        """
+        if self._desktop is None:
+            return  # nothing to disconnect, skip the lock
         with self._lock:
             if self._desktop is not None:
-                try:
-                    self._desktop.terminate()
-                except:
-                    pass
+                if terminate:
+                    try:
+                        self._desktop.terminate()
+                    except:
+                        pass
                 self._desktop = None
                 self._ctx = None
                 self._connected = False
+                # terminate() shut soffice down: the next connect must probe and restart it
+                self._service_up = False
                 logger.info("🔌 已断开LibreOffice服务连接")
 
     def stop_service(self):
-        """停止LibreOffice服务"""
-        self.disconnect()
+        """停止LibreOffice服务（仅关闭本进程启动的soffice，连接到的外部服务保持运行）"""
+        self.disconnect(terminate=self._soffice_process is not None)
         if self._soffice_process:
             try:
                 self._soffice_process.terminate()
-                self._soffice_process.wait(timeout=10)
+                if not _wait_process(self._soffice_process, 10):
+                    self._soffice_process.kill()
+                    self._soffice_process.wait()
             except:
                 self._soffice_process.kill()
             self._soffice_process = None
             logger.info("🛑 LibreOffice服务已停止")
+        self._service_up = False
 
     @contextmanager
     def get_document(self, file_path: str):
@@ -242,30 +379,28 @@ class UnoManager:
         Yields:
             文档对象
         """
-        self.connect()
+        self._ensure_alive()
 
         # converse path to URL
-        file_url = uno.systemPathToFileUrl(os.path.abspath(file_path))
-
-        # open file
-        properties = []
-        properties.append(self._make_property("Hidden", True))
-        properties.append(self._make_property("ReadOnly", True))
+        file_url = _to_file_url(file_path)
 
         document = None
         try:
-            document = self._desktop.loadComponentFromURL(
-                file_url, "_blank", 0, properties
-            )
+            # open file
+            document = self._load_from_url(file_url, "_blank", 0, self._load_props)
             logger.debug(f"📄 打开文档: {file_path}")
             yield document
         finally:
             if document:
                 try:
-                    document.dispose()
+                    # close(True) also releases the frame created by "_blank"
+                    document.close(True)
                     logger.debug(f"📄 关闭文档: {file_path}")
                 except:
-                    pass
+                    try:
+                        document.dispose()
+                    except:
+                        pass
 
     def convert_document(
         self,
@@ -288,86 +423,116 @@ class UnoManager:
         with self.get_document(input_path) as document:
             if document is None:
                 raise Exception(f"无法打开文档: {input_path}")
+            self._store_document(document, input_path, output_path, output_format, filter_name)
 
-            # prepare to output properties
-            properties = []
-
-            # set filter
-            if filter_name:
-                properties.append(self._make_property("FilterName", filter_name))
-            else:
-                # choose filter by format
-                if output_format == "txt":
-                    # multi-filter for multi-files
-                    filter_options = [
-                        ("Text (encoded)", "UTF8"),
-                        ("Text", None),
-                        ("HTML (StarWriter)", None),
-                    ]
-
-                    success = False
-                    for filter_name, filter_option in filter_options:
-                        try:
-                            properties = []
-                            properties.append(
-                                self._make_property("FilterName", filter_name)
-                            )
-                            if filter_option:
-                                properties.append(
-                                    self._make_property("FilterOptions", filter_option)
-                                )
-
-                            # ensuring that the output directory exists.
-                            output_dir = os.path.dirname(output_path)
-                            if output_dir and not os.path.exists(output_dir):
-                                os.makedirs(output_dir)
-
-                            # converse to URL
-                            output_url = uno.systemPathToFileUrl(
-                                os.path.abspath(output_path)
-                            )
-
-                            # conversing
-                            document.storeToURL(output_url, properties)
-                            logger.info(
-                                f"✅ 文档转换成功 (使用过滤器: {filter_name}): {output_path}"
-                            )
-                            success = True
-                            break
-                        except Exception as e:
-                            logger.debug(f"🔄 过滤器 {filter_name} 失败: {str(e)}")
-                            continue
-
-                    if not success:
-                        raise Exception(
-                            f"所有文本过滤器都失败，无法转换文档: {input_path}"
-                        )
+    def convert_many(self, jobs: List[Tuple[str, str, str]]):
+        """
+        批量转换文档：同一输入文件只打开一次，依次导出到它的所有输出
 
-                    return  # converted,return
-                else:
-                    # Other formats use the default filter
-                    filter_map = {
-                        "pdf": "writer_pdf_Export",
-                        "docx": "MS Word 2007 XML",
-                        "pptx": "Impress MS PowerPoint 2007 XML",
-                        "xlsx": "Calc MS Excel 2007 XML",
-                    }
-                    if output_format in filter_map:
-                        properties.append(
-                            self._make_property("FilterName", filter_map[output_format])
+        Args:
+            jobs: (input_path, output_path, output_format) 列表
+        """
+        by_input: Dict[str, List[Tuple[str, str]]] = {}
+        for input_path, output_path, output_format in jobs:
+            by_input.setdefault(input_path, []).append((output_path, output_format))
+
+        for input_path, outputs in by_input.items():
+            logger.info(f"🔄 开始转换文档: {input_path} -> {len(outputs)} 个输出")
+            with self.get_document(input_path) as document:
+                if document is None:
+                    raise Exception(f"无法打开文档: {input_path}")
+                for output_path, output_format in outputs:
+                    self._store_document(document, input_path, output_path, output_format)
+
+    def _store_document(
+        self,
+        document,
+        input_path: str,
+        output_path: str,
+        output_format: str,
+        filter_name: Optional[str] = None,
+    ):
+        """将已打开的文档导出为指定格式"""
+        # prepare to output properties
+        properties = ()
+
+        # set filter
+        if filter_name:
+            properties = self._filter_properties(filter_name)
+        else:
+            # choose filter by format
+            if output_format == "txt":
+                # multi-filter for multi-files
+                filter_options = [
+                    ("Text (encoded)", "UTF8"),
+                    ("Text", None),
+                    ("HTML (StarWriter)", None),
+                ]
+
+                # ensuring that the output directory exists.
+                self._ensure_output_dir(output_path)
+
+                # converse to URL (same for every filter attempt)
+                output_url = _to_file_url(output_path)
+                store = document.storeToURL
+
+                success = False
+                for filter_name, filter_option in filter_options:
+                    try:
+                        properties = self._filter_properties(filter_name, filter_option)
+
+                        # conversing
+                        store(output_url, properties)
+                        logger.info(
+                            f"✅ 文档转换成功 (使用过滤器: {filter_name}): {output_path}"
                         )
+                        success = True
+                        break
+                    except Exception as e:
+                        logger.debug(f"🔄 过滤器 {filter_name} 失败: {str(e)}")
+                        continue
+
+                if not success:
+                    raise Exception(
+                        f"所有文本过滤器都失败，无法转换文档: {input_path}"
+                    )
 
-            # ensuring that the output directory exists
-            output_dir = os.path.dirname(output_path)
-            if output_dir and not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-
-            # converse to URL
-            output_url = uno.systemPathToFileUrl(os.path.abspath(output_path))
-
-            # conversing
-            document.storeToURL(output_url, properties)
-            logger.info(f"✅ 文档转换成功: {output_path}")
+                return  # converted,return
+            else:
+                # Other formats use the default filter
+                if output_format in FILTER_MAP:
+                    properties = self._filter_properties(FILTER_MAP[output_format])
+
+        # ensuring that the output directory exists
+        self._ensure_output_dir(output_path)
+
+        # converse to URL
+        output_url = _to_file_url(output_path)
+
+        # conversing
+        document.storeToURL(output_url, properties)
+        logger.info(f"✅ 文档转换成功: {output_path}")
+
+    def _ensure_output_dir(self, output_path: str):
+        """确保输出目录存在"""
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            # exist_ok: a single mkdir, no stat first and no race with another writer
+            os.makedirs(output_dir, exist_ok=True)
+
+    def _filter_properties(self, filter_name: str, filter_option: Optional[str] = None) -> tuple:
+        """导出属性序列，按 (过滤器, 选项) 只构建一次"""
+        key = (filter_name, filter_option)
+        properties = self._filter_props.get(key)
+        if properties is None:
+            properties = (
+                self._make_property("FilterName", filter_name),
+                self._make_property("Overwrite", True),
+            )
+            if filter_option:
+                properties += (self._make_property("FilterOptions", filter_option),)
+            self._filter_props[key] = properties
+        return properties
 
     def _make_property(self, name: str, value):
         """创建属性对象"""
@@ -409,6 +574,11 @@ def cleanup_uno_manager():
             logger.info("🧹 清理全局UnoManager")
 
 
+# stop the soffice started by the singleton when the interpreter exits, instead of leaving
+# a headless LibreOffice holding the port; a no-op if no manager was ever created
+atexit.register(cleanup_uno_manager)
+
+
 @contextmanager
 def uno_manager_context():
     """UNO管理器上下文管理器，自动获取和管理"""
@@ -447,3 +617,26 @@ def convert_with_uno(
         manager.convert_document(str(input_path), str(output_path), output_format)
 
     return str(output_path)
+
+
+def convert_many_with_uno(jobs: List[Tuple[str, str, Optional[str]]]) -> List[str]:
+    """
+    使用UNO批量转换文档（便捷函数），同一输入文件只打开一次
+
+    Args:
+        jobs: (input_path, output_format, output_dir) 列表，output_dir 可为 None
+
+    Returns:
+        与 jobs 顺序一致的输出文件路径列表
+    """
+    resolved = []
+    for input_path, output_format, output_dir in jobs:
+        input_path = Path(input_path)
+        output_dir = input_path.parent if output_dir is None else Path(output_dir)
+        output_path = output_dir / f"{input_path.stem}.{output_format}"
+        resolved.append((str(input_path), str(output_path), output_format))
+
+    with uno_manager_context() as manager:
+        manager.convert_many(resolved)
+
+    return [output_path for _, output_path, _ in resolved]
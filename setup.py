@@ -43,6 +43,10 @@ setup(
         "ebooklib==0.19",
         "setuptools"
     ],
+    extras_require={
+        # structure-preserving Markdown for PDFs parsed with to_markdown=True
+        "pdf-markdown": ["pymupdf4llm>=0.0.17,<1.0.0"],
+    },
     author="ccy",
     author_email="cy.kron@foxmail.com",
     description="A library for parsing and converting various file formats.",
@@ -4,7 +4,7 @@ import pytest
 from pathlib import Path
 
 # 注意导入路径，对应 datamax/parser/core.py
-from datamax.parser.core import DataMax
+from datamax.parser.core import DataMax, ParserFactory
 # BaseLife 里定义了预置列表 PREDEFINED_DOMAINS :contentReference[oaicite:0]{index=0}
 from datamax.parser.base import PREDEFINED_DOMAINS
 
@@ -55,3 +55,58 @@ def test_clean_data_uses_domain(monkeypatch, dummy_file):
     dm.clean_data(method_list=["filter"])
     # 至少有一次调用 domain 为 "Health"
     assert "Health" in calls
+
+@pytest.mark.parametrize("name", ["a.jpg", "a.jpeg", "a.png", "a.webp"])
+def test_image_extensions_use_image_parser_module(monkeypatch, name):
+    """所有图片扩展名（包括 .jpeg）都应路由到 image_parser 模块"""
+    modules = []
+    def fake_import(module_name):
+        modules.append(module_name)
+        class Module:
+            class ImageParser:
+                def __init__(self, file_path, domain):
+                    self.file_path = file_path
+        return Module
+
+    monkeypatch.setattr("datamax.parser.core.importlib.import_module", fake_import)
+    parser = ParserFactory.create_parser(file_path=name)
+    assert modules == ["datamax.parser.image_parser"]
+    assert parser.file_path == name
+
+def test_cache_invalidated_when_file_content_changes(monkeypatch, tmp_path):
+    """缓存按文件内容哈希命中：内容不变不重复解析，内容改写后重新解析"""
+    calls = []
+    monkeypatch.setattr(DataMax, "_parse_file", lambda self, f: calls.append(f) or {"content": Path(f).read_text()})
+
+    f = tmp_path / "foo.txt"
+    f.write_text("v1")
+    dm = DataMax(file_path=str(f))
+    assert dm.get_data()["content"] == "v1"
+    assert dm.get_data()["content"] == "v1"
+    assert len(calls) == 1
+
+    f.write_text("v2")
+    assert dm.get_data()["content"] == "v2"
+    assert len(calls) == 2
+
+def test_no_hashing_when_cache_disabled(monkeypatch, dummy_file):
+    """ttl <= 0 时不计算文件哈希，也不查询缓存"""
+    monkeypatch.setattr(DataMax, "_parse_file", lambda self, f: {"content": "x"})
+    monkeypatch.setattr(DataMax, "_cache_key", lambda self, f: pytest.fail("file hashed"))
+
+    assert DataMax(file_path=dummy_file, ttl=0).get_data() == {"content": "x"}
+    dm = DataMax(file_path=[dummy_file, dummy_file], ttl=0, max_workers=2)
+    assert dm.get_data() == [{"content": "x"}, {"content": "x"}]
+
+
+def test_context_manager_closes_model_clients(dummy_file):
+    """with 块结束时关闭 ModelInvoker 缓存的客户端"""
+    closed = []
+
+    class FakeClient:
+        def close(self):
+            closed.append(True)
+
+    with DataMax(file_path=dummy_file) as dm:
+        dm.model_invoker._clients[("k", "http://llm")] = FakeClient()
+    assert closed == [True] and dm.model_invoker._clients == {}
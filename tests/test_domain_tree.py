@@ -0,0 +1,60 @@
+# tests/test_domain_tree.py
+
+import pytest
+
+from datamax.utils.domain_tree import DomainTree
+
+
+@pytest.fixture
+def tree():
+    return DomainTree([
+        {"label": "1 技术", "child": [
+            {"label": "1.1 编程语言", "child": [{"label": "Python"}]},
+            {"label": "1.2 数据库"},
+        ]},
+        {"label": "2 金融"},
+    ])
+
+def test_find_node_and_path(tree):
+    """find_node / find_path 应能找到任意层级的节点"""
+    assert tree.find_node("1.2 数据库") == {"label": "1.2 数据库"}
+    assert tree.find_node("Python") == {"label": "Python"}
+    assert tree.find_path("Python") == "1 技术/1.1 编程语言/Python"
+    assert tree.find_path("2 金融") == "2 金融"
+    assert tree.find_node("不存在") is None
+    assert tree.find_path("不存在") is None
+
+def test_index_follows_changes(tree):
+    """增删改之后查找结果应同步更新"""
+    assert tree.add_node("Java", "1.1 编程语言")
+    assert tree.find_path("Java") == "1 技术/1.1 编程语言/Java"
+
+    assert tree.update_node("1.1 编程语言", "1.1 语言")
+    assert tree.find_node("1.1 编程语言") is None
+    assert tree.find_path("Java") == "1 技术/1.1 语言/Java"
+
+    assert tree.remove_node("1.1 语言")
+    assert tree.find_node("Java") is None
+    assert tree.find_node("Python") is None
+    assert tree.to_json()[0]["child"] == [{"label": "1.2 数据库"}]
+
+    assert tree.insert_node_between("1.2 中间", "1 技术", "1.2 数据库")
+    assert tree.find_path("1.2 数据库") == "1 技术/1.2 中间/1.2 数据库"
+
+    tree.from_json([{"label": "新根"}])
+    assert tree.find_node("1 技术") is None
+    assert tree.find_path("新根") == "新根"
+
+def test_duplicate_labels_resolve_to_first(tree):
+    """重名标签按深度优先顺序取第一个，删除后下一个同名节点可被找到"""
+    tree.add_node("Python", "2 金融")
+    assert tree.find_path("Python") == "1 技术/1.1 编程语言/Python"
+    assert tree.remove_node("Python")
+    assert tree.find_path("Python") == "2 金融/Python"
+
+
+def test_label_paths_matches_find_path(tree):
+    """label_paths 快照应与逐个 find_path 的结果一致"""
+    paths = tree.label_paths()
+    assert paths == {label: tree.find_path(label) for label in paths}
+    assert paths["Python"] == "1 技术/1.1 编程语言/Python"
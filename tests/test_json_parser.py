@@ -0,0 +1,37 @@
+# tests/test_json_parser.py
+
+import json
+
+import pytest
+
+from datamax.parser.json_parser import JsonParser
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"名称": "数据", "列表": [1, 2.5, None, True], "嵌套": {"空": {}, "数组": []}},
+        [{"a": 1}, "文本", 0],
+        {"big": 2 ** 70},
+        {"floats": [1e16, 1.5e-07, 0.1, -0.0, 123456789.123], "nested": {"x": 2.5}},
+    ],
+)
+def test_read_json_file_matches_json_dumps(tmp_path, data):
+    """read_json_file 的输出应与 json.dumps(indent=2, ensure_ascii=False) 一致"""
+    f = tmp_path / "a.json"
+    f.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    assert JsonParser.read_json_file(str(f)) == json.dumps(data, indent=2, ensure_ascii=False)
+
+
+def test_read_json_file_keeps_non_finite_numbers(tmp_path):
+    """NaN/Infinity 不能被写成 null"""
+    f = tmp_path / "a.json"
+    f.write_text('{"a": NaN, "b": [Infinity]}', encoding="utf-8")
+    assert JsonParser.read_json_file(str(f)) == '{\n  "a": NaN,\n  "b": [\n    Infinity\n  ]\n}'
+
+
+def test_read_json_file_escaped_lone_surrogate(tmp_path):
+    """转义的孤立代理字符 orjson 无法编码，应回退到 json 且结果一致"""
+    f = tmp_path / "a.json"
+    f.write_text('{"text": "\\ud800"}', encoding="utf-8")
+    assert JsonParser.read_json_file(str(f)) == json.dumps({"text": "\ud800"}, indent=2, ensure_ascii=False)
@@ -0,0 +1,18 @@
+# tests/test_pdf_parser.py
+
+import pytest
+
+pdf_parser = pytest.importorskip("datamax.parser.pdf_parser")
+PdfParser = pdf_parser.PdfParser
+
+
+@pytest.mark.parametrize("to_markdown, expected", [(False, "纯文本"), (True, "# Markdown")])
+def test_pymupdf4llm_only_used_with_to_markdown(monkeypatch, tmp_path, to_markdown, expected):
+    """默认输出纯文本层；只有显式 to_markdown=True 才走 pymupdf4llm，安装与否不改变默认结果"""
+    monkeypatch.setattr(PdfParser, "read_pdf_file", staticmethod(lambda file_path: "纯文本"))
+    monkeypatch.setattr(PdfParser, "read_pdf_markdown", staticmethod(lambda file_path: "# Markdown"))
+    f = tmp_path / "a.pdf"
+    f.write_bytes(b"%PDF-1.4")
+
+    result = PdfParser(str(f), to_markdown=to_markdown).parse(str(f))
+    assert result["content"] == expected
@@ -0,0 +1,363 @@
+# tests/test_qa_generator.py
+
+import sys
+import types
+
+import pytest
+
+from datamax.utils import qa_generator as qa_gen
+from datamax.utils.domain_tree import DomainTree
+
+
+def test_merge_domain_trees_renumbers_and_dedupes_by_depth():
+    """分段领域树合并：去掉各段序号后同层去重，重新编号，不跨层级合并"""
+    first = DomainTree([
+        {"label": "1 机器学习", "child": [{"label": "1.1 监督学习"}]},
+        {"label": "2 数据库"},
+    ])
+    second = DomainTree([
+        {"label": "1 机器学习", "child": [{"label": "1.1 监督学习"}, {"label": "1.2 强化学习"}]},
+        {"label": "2 监督学习", "child": [{"label": "2.1 回归"}]},
+    ])
+    merged = qa_gen._merge_domain_trees([first, None, second])
+    assert merged == [
+        {"label": "1 机器学习", "child": [{"label": "1.1 监督学习"}, {"label": "1.2 强化学习"}]},
+        {"label": "2 数据库"},
+        {"label": "3 监督学习", "child": [{"label": "3.1 回归"}]},
+    ]
+
+
+def test_full_qa_uses_single_tree_request_by_default(monkeypatch):
+    """未开启 parallel_domain_tree 时，领域树走单次请求"""
+    calls = []
+    monkeypatch.setattr(qa_gen, "process_domain_tree", lambda **kw: calls.append("single"))
+    monkeypatch.setattr(qa_gen, "process_domain_tree_parallel", lambda **kw: calls.append("parallel"))
+    monkeypatch.setattr(qa_gen, "process_questions", lambda **kw: [])
+    monkeypatch.setattr(qa_gen, "generatr_qa_pairs", lambda **kw: [])
+    monkeypatch.setattr(qa_gen, "_get_splitter", lambda *a: type("S", (), {"split_text": staticmethod(lambda t: [t])}))
+
+    qa_gen.full_qa_labeling_process(
+        content="x" * 20000, api_key="k", base_url="http://llm", model_name="m", interactive_tree=False
+    )
+    assert calls == ["single"]
+
+
+def test_post_llm_closes_retried_responses(monkeypatch):
+    """429 等可重试响应在退避重试前应被关闭，归还连接池中的连接"""
+    class Resp:
+        def __init__(self, status):
+            self.status_code = status
+            self.headers = {}
+            self.closed = False
+
+        def raise_for_status(self):
+            pass
+
+        def close(self):
+            self.closed = True
+
+    responses = [Resp(429), Resp(503), Resp(200)]
+    monkeypatch.setattr(qa_gen._SESSION, "post", lambda *a, **kw: responses.pop(0), raising=False)
+    monkeypatch.setattr(qa_gen, "_LIMITER", None)
+    monkeypatch.setattr(qa_gen.time, "sleep", lambda s: None)
+
+    first, second, last = list(responses)
+    assert qa_gen._post_llm("http://llm", {}, {}, stream=True) is last
+    assert first.closed and second.closed and not last.closed
+
+
+@pytest.mark.parametrize(
+    "option", [{"messages": [{"role": "system", "content": "x"}]}, {"use_batch_api": True}, {"answer_cache_path": "a.db"}]
+)
+def test_one_shot_qa_rejects_options_it_cannot_honor(option):
+    """one_shot_qa 与 messages / use_batch_api / answer_cache_path 同时传入时应报错，而不是静默忽略"""
+    with pytest.raises(ValueError, match="one_shot_qa"):
+        qa_gen.full_qa_labeling_process(
+            content="text", api_key="k", base_url="http://llm", model_name="m", one_shot_qa=True, **option
+        )
+
+
+def _fake_label_llm(replies):
+    """按调用顺序返回预置回复，并记录每次请求的用户消息"""
+    import json
+    calls = []
+
+    def fake(**kwargs):
+        calls.append(json.loads(kwargs["message"][1]["content"]))
+        return replies.pop(0)
+
+    return fake, calls
+
+
+def test_process_match_tags_maps_batch_by_index(monkeypatch):
+    """批量打标按题目序号回填：模型改写或打乱问题顺序也不会丢标签"""
+    fake, calls = _fake_label_llm([[
+        {"id": 1, "question": "问题二（改写）", "label": "1.2 B"},
+        {"id": 0, "question": "问题一？", "label": "1.1 A"},
+    ]])
+    monkeypatch.setattr(qa_gen, "llm_generator", fake)
+
+    result = qa_gen.process_match_tags(
+        api_key="k", model="m", base_url="http://llm", questions=["问题一", "问题二"], tags_json=[]
+    )
+    assert result == [{"question": "问题一", "label": "1.1 A"}, {"question": "问题二", "label": "1.2 B"}]
+    assert calls == [[{"id": 0, "question": "问题一"}, {"id": 1, "question": "问题二"}]]
+
+
+def test_process_match_tags_falls_back_per_question(monkeypatch):
+    """批量回复遗漏的问题逐题重新匹配；单题仍无结果时标记为“其他”"""
+    fake, calls = _fake_label_llm([
+        [{"id": 0, "label": "1.1 A"}],  # batch: drops question 2 and 3
+        [{"question": "问题二", "label": "1.2 B"}],  # lone reply without id
+        [],  # question 3 still unmatched
+    ])
+    monkeypatch.setattr(qa_gen, "llm_generator", fake)
+
+    result = qa_gen.process_match_tags(
+        api_key="k", model="m", base_url="http://llm", questions=["问题一", "问题二", "问题三"], tags_json=[]
+    )
+    assert [r["label"] for r in result] == ["1.1 A", "1.2 B", "其他"]
+    assert calls[1:] == [[{"id": 0, "question": "问题二"}], [{"id": 0, "question": "问题三"}]]
+
+
+def _fake_answer_llm(batch_reply, calls):
+    """批量请求返回 batch_reply；逐题请求按提示词中的问题返回答案"""
+    def fake(**kwargs):
+        calls.append(kwargs["type"])
+        if kwargs["type"] == "question":
+            return batch_reply
+        question = next(q for q in ("问题一", "问题二", "问题三") if q in kwargs["prompt"])
+        return [f"单独:{question}"]
+
+    return fake
+
+
+def test_process_answers_batch_keeps_answers_matched(monkeypatch):
+    """按页批量生成答案时，模型打乱顺序或遗漏问题，答案仍与问题一一对应"""
+    calls = []
+    monkeypatch.setattr(qa_gen, "llm_generator", _fake_answer_llm([
+        {"question": "问题三", "answer": "答三"},
+        {"question": "问题一", "answer": "答一"},
+    ], calls))
+    items = [{"question": q, "page": "同一页"} for q in ("问题一", "问题二", "问题三")]
+
+    qa_pairs = qa_gen.process_answers(
+        api_key="k", model="m", base_url="http://llm", question_items=items, batch_by_page=True
+    )
+    assert qa_pairs == {"问题一": "答一", "问题二": "单独:问题二", "问题三": "答三"}
+    assert calls == ["question", "answer"]
+
+
+def test_process_answers_defaults_to_one_call_per_question(monkeypatch):
+    """默认不按页批量，每个问题单独生成答案"""
+    calls = []
+    monkeypatch.setattr(qa_gen, "llm_generator", _fake_answer_llm([], calls))
+    items = [{"question": q, "page": "同一页"} for q in ("问题一", "问题二")]
+
+    qa_pairs = qa_gen.process_answers(api_key="k", model="m", base_url="http://llm", question_items=items)
+    assert qa_pairs == {"问题一": "单独:问题一", "问题二": "单独:问题二"}
+    assert calls == ["answer", "answer"]
+
+
+def test_process_answers_cache_hit_and_miss(monkeypatch, tmp_path):
+    """答案缓存：首次生成并写入，再次运行直接命中，新问题仍调用大模型"""
+    cache_path = str(tmp_path / "answers.db")
+    calls = []
+    monkeypatch.setattr(qa_gen, "llm_generator", _fake_answer_llm([], calls))
+    page = "同一页"
+
+    first = qa_gen.process_answers(
+        api_key="k", model="m", base_url="http://llm", cache_path=cache_path,
+        question_items=[{"question": "问题一", "page": page}],
+    )
+    assert first == {"问题一": "单独:问题一"} and len(calls) == 1
+
+    second = qa_gen.process_answers(
+        api_key="k", model="m", base_url="http://llm", cache_path=cache_path,
+        question_items=[{"question": "问题一", "page": page}, {"question": "问题二", "page": page}],
+    )
+    assert second == {"问题一": "单独:问题一", "问题二": "单独:问题二"}
+    assert len(calls) == 2  # only 问题二 missed the cache
+
+    other_page = qa_gen.process_answers(
+        api_key="k", model="m", base_url="http://llm", cache_path=cache_path,
+        question_items=[{"question": "问题一", "page": "另一页"}],
+    )
+    assert other_page == {"问题一": "单独:问题一"} and len(calls) == 3  # key includes the page
+
+
+class _FakeClock:
+    """替代 qa_generator 中的 time 模块：sleep 只推进虚拟时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter_waits_for_rpm_window(monkeypatch):
+    """超过每分钟请求数时等待到最早请求滑出 60 秒窗口"""
+    clock = _FakeClock()
+    monkeypatch.setattr(qa_gen, "time", clock)
+    limiter = qa_gen._RateLimiter(rpm=2)
+
+    limiter.acquire(0)
+    clock.now = 10
+    limiter.acquire(0)
+    assert clock.sleeps == []
+    limiter.acquire(0)
+    assert clock.sleeps == [50]
+
+
+def test_rate_limiter_counts_tokens_and_admits_oversized_request(monkeypatch):
+    """按 tpm 限流；窗口为空时超大请求也放行，不会永久阻塞"""
+    clock = _FakeClock()
+    monkeypatch.setattr(qa_gen, "time", clock)
+    limiter = qa_gen._RateLimiter(tpm=100)
+
+    limiter.acquire(500)  # empty window: admitted despite exceeding tpm
+    limiter.acquire(10)
+    assert clock.sleeps == [60]
+    clock.now = 70
+    limiter.acquire(80)
+    limiter.acquire(20)
+    assert clock.sleeps == [60, 50]
+
+
+@pytest.fixture
+def llm_cache(tmp_path):
+    qa_gen.set_llm_cache(str(tmp_path / "llm.db"))
+    yield
+    qa_gen.set_llm_cache(None)
+
+
+def test_llm_generator_cache_hit_and_miss(monkeypatch, llm_cache):
+    """相同请求命中缓存不再调用接口；参数不同或输出无法解析时不命中"""
+    outputs = ['```json\n["问题一"]\n```', "不是JSON", '["问题二"]', '["问题三"]']
+    posts = []
+
+    class Resp:
+        def __init__(self, content):
+            self.content = content
+
+        def json(self):
+            return {"choices": [{"message": {"content": self.content}}]}
+
+    def fake_post(base_url, headers, data, stream=False):
+        posts.append(data["temperature"])
+        return Resp(outputs.pop(0))
+
+    monkeypatch.setattr(qa_gen, "_post_llm", fake_post)
+
+    def call(prompt, **kw):
+        return qa_gen.llm_generator(
+            api_key="k", model="m", base_url="http://llm", prompt=prompt, type="question", **kw
+        )
+
+    assert call("p1") == ["问题一"]
+    assert call("p1") == ["问题一"] and len(posts) == 1  # hit
+    assert call("p2") == [] and call("p2") == ["问题二"]  # unparseable reply is not cached
+    assert call("p1", temperature=0.1) == ["问题三"]  # sampling params are part of the key
+    assert posts == [0.7, 0.7, 0.7, 0.1]
+
+
+@pytest.mark.parametrize(
+    "output, expected",
+    [
+        ('说明\n```json\n["a"]\n```\n结尾', '["a"]\n'),
+        ('```\n["a"]\n```', '["a"]\n'),
+        ('```json\n["a"]```', '["a"]'),  # closed right after the json
+        ('```python\nx\n```\n```json\n["a"]\n```', '["a"]\n'),  # ```json wins over an earlier fence
+        ('```python\nx = 1\n```\n[1]', None),  # other languages are not json
+        ('```python\nx = 1\n```\n说明\n```\n[1]\n```', '[1]\n'),  # bare fence after one
+        ('["a"]', None),
+        ('```json ["a"]', None),  # no newline after the opening fence
+        ('```json\n["a"]', None),  # not closed yet (streaming)
+    ],
+)
+def test_fenced_json(output, expected):
+    """_fenced_json 提取第一个 ```json 代码块（无语言标记的代码块亦可，其他语言的代码块跳过）"""
+    assert qa_gen._fenced_json(output) == expected
+
+
+def test_extract_json_from_llm_output_fenced_and_bare():
+    """代码块内与裸 JSON 都能解析"""
+    assert qa_gen.extract_json_from_llm_output('好的\n```json\n[{"q": "问"}]\n```') == [{"q": "问"}]
+    assert qa_gen.extract_json_from_llm_output('[{"q": "问"}]') == [{"q": "问"}]
+
+
+class _FakeBatchClient:
+    """假的 OpenAI 客户端：files.create 可抛错，批处理任务始终处于 in_progress"""
+
+    def __init__(self, fail_submit=False):
+        self.fail_submit = fail_submit
+        self.cancelled = []
+        self.files = types.SimpleNamespace(create=self._create_file)
+        self.batches = types.SimpleNamespace(
+            create=lambda **kw: types.SimpleNamespace(id="b1", status="validating"),
+            retrieve=lambda batch_id: types.SimpleNamespace(id=batch_id, status="in_progress"),
+            cancel=self.cancelled.append,
+        )
+
+    def _create_file(self, **kw):
+        if self.fail_submit:
+            raise ConnectionError("upload failed")
+        return types.SimpleNamespace(id="f1")
+
+
+def _use_batch_client(monkeypatch, client):
+    monkeypatch.setitem(sys.modules, "openai", types.SimpleNamespace(OpenAI=lambda **kw: client))
+
+
+def test_batch_chat_completions_returns_none_when_submit_fails(monkeypatch):
+    """提交批处理失败时记录错误并返回全 None，由调用方回退到实时调用"""
+    _use_batch_client(monkeypatch, _FakeBatchClient(fail_submit=True))
+    assert qa_gen._batch_chat_completions("k", "http://llm", "m", ["p1", "p2"]) == [None, None]
+
+
+def test_batch_chat_completions_gives_up_after_max_wait(monkeypatch):
+    """任务超过 max_wait 仍未结束时取消任务并返回全 None"""
+    clock = _FakeClock()
+    monkeypatch.setattr(qa_gen, "time", clock)
+    client = _FakeBatchClient()
+    _use_batch_client(monkeypatch, client)
+
+    outputs = qa_gen._batch_chat_completions(
+        "k", "http://llm", "m", ["p1"], poll_interval=30, max_wait=100
+    )
+    assert outputs == [None]
+    assert client.cancelled == ["b1"] and clock.sleeps == [30] * 4
+
+
+def test_edit_prompt_rejects_missing_target():
+    """派生提示词时替换目标不存在立即报错，不会静默保留原文"""
+    assert qa_gen._edit_prompt("a ${x} b", (("${x}", "y"),)) == "a y b"
+    with pytest.raises(ValueError):
+        qa_gen._edit_prompt("a b", (("${x}", "y"),))
+
+
+def test_failed_request_is_not_retried_by_outer_loop(monkeypatch):
+    """_post_llm 重试用尽后 llm_generator 返回 None，process_questions 不再外层重试"""
+    posts = []
+
+    def failing_post(base_url, headers, data, stream=False):
+        posts.append(data)
+        raise qa_gen.requests.ConnectionError("down")
+
+    monkeypatch.setattr(qa_gen, "_post_llm", failing_post)
+    assert qa_gen.llm_generator(
+        api_key="k", model="m", base_url="http://llm", prompt="p", type="question"
+    ) is None
+
+    posts.clear()
+    questions = qa_gen.process_questions(
+        api_key="k", model="m", base_url="http://llm", page_content=["第一页"],
+        question_number=2, max_workers=1, max_retries=3,
+    )
+    assert questions == [] and len(posts) == 1
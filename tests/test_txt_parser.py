@@ -0,0 +1,10 @@
+# tests/test_txt_parser.py
+
+from datamax.parser.txt_parser import TxtParser
+
+
+def test_read_txt_file_normalizes_newlines(tmp_path):
+    """与文本模式 open() 一致：\r\n 和 \r 都转换为 \n"""
+    f = tmp_path / "a.txt"
+    f.write_bytes("第一行\r\n第二行\rthird\n".encode("utf-8"))
+    assert TxtParser.read_txt_file(str(f)) == "第一行\n第二行\nthird\n"
@@ -0,0 +1,41 @@
+# tests/test_xlsx_parser.py
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from datamax.parser.xlsx_parser import XlsxParser
+
+
+def test_parse_timeout_abandons_worker_on_daemon_thread(monkeypatch, tmp_path):
+    """超时后立即抛出 TimeoutError，仍在运行的解析线程是守护线程，不阻塞退出"""
+    f = tmp_path / "a.xlsx"
+    f.write_bytes(b"x")
+    release = threading.Event()
+    monkeypatch.setattr(XlsxParser, "_parse", lambda self, path: release.wait(5))
+
+    parser = XlsxParser(str(f), timeout=0.1)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        parser.parse(str(f))
+    assert time.monotonic() - start < 2
+
+    workers = [t for t in threading.enumerate() if t.name == "xlsx-parse"]
+    assert workers and all(t.daemon for t in workers)
+    release.set()
+
+
+def test_parse_propagates_worker_error(monkeypatch, tmp_path):
+    """工作线程中的异常应原样抛给调用方"""
+    f = tmp_path / "a.xlsx"
+    f.write_bytes(b"x")
+
+    def boom(self, path):
+        raise ValueError("bad sheet")
+
+    monkeypatch.setattr(XlsxParser, "_parse", boom)
+    with pytest.raises(ValueError, match="bad sheet"):
+        XlsxParser(str(f)).parse(str(f))